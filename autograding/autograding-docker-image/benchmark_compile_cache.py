@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Measures what the image's compiler cache saves when checking a whole cohort.
+
+Every submission directory under cohort_dir is checked twice in the docker sandbox: first with an emptied cache volume
+(cold), then again with the cache that the first pass filled (warm). Only compilation is served from the cache, so the
+difference between the passes is the compile time saved. ccache's hit statistics are printed after each pass; they
+count only the instructor's sources compiled by precompile-checks, the only compiles that store results (see
+docker-entrypoint), so a warm pass should be all hits. Students' own files are compiled afresh in both passes.
+
+usage: benchmark_compile_cache.py cohort_dir [--checks DIR] [--dist DIR]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent.parent))
+from utils.sandbox import (  # pylint:disable=wrong-import-position
+    CHECK50_COMMAND,
+    DockerSandbox,
+    get_sandbox,
+)
+from utils import logger  # pylint:disable=wrong-import-position
+
+MODULE_CONFIG_SECTION = "GRADER"
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("cohort_dir", type=Path, help="directory with one sub-directory per submission")
+    parser.add_argument("--dist", help="instructor files needed to compile, defaults to path_to_dist")
+    parser.add_argument("--checks", help="check50 checks to run, defaults to path_to_checks")
+    return parser.parse_args()
+
+
+def ccache(sandbox: DockerSandbox, *args) -> str:
+    p = subprocess.run(
+        [
+            "docker",
+            "run",
+            "--rm",
+            f"--volume={sandbox.cache_volume}:/cache",
+            # as the user that owns the cache, so the statistics files stay writable by precompile-checks
+            "--user=grader",
+            "--entrypoint=ccache",
+            sandbox.image,
+            *args,
+        ],
+        capture_output=True,
+        check=False,
+    )
+    return p.stdout.decode()
+
+
+def time_pass(sandbox: DockerSandbox, submissions):
+    latencies = []
+    for submission_dir in submissions:
+        start = time.perf_counter()
+        sandbox.run(CHECK50_COMMAND, submission_dir)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    args = parse_args()
+    sandbox = get_sandbox(MODULE_CONFIG_SECTION, DockerSandbox.name, args.checks, args.dist)
+    if not sandbox.cache_volume:
+        logger.error("cache_volume is empty in config.ini, there is no compiler cache to benchmark")
+        sys.exit(1)
+
+    submissions = sorted(d for d in args.cohort_dir.iterdir() if d.is_dir())
+    logger.info(f"Emptying compiler cache volume {sandbox.cache_volume}")
+    subprocess.run(["docker", "volume", "rm", "-f", sandbox.cache_volume], capture_output=True, check=False)
+
+    timings = {}
+    for name in ("cold", "warm"):
+        ccache(sandbox, "--zero-stats")
+        logger.info(f"Checking {len(submissions)} submissions with a {name} cache")
+        timings[name] = time_pass(sandbox, submissions)
+        console.print(f"[bold]ccache statistics after the {name} pass[/bold]")
+        console.print(ccache(sandbox, "--show-stats"))
+
+    table = Table(title="Per-submission check time (seconds)", header_style="bold magenta")
+    for column in ("Cache", "Submissions", "Total", "Mean", "Median"):
+        table.add_column(column)
+    for name, latencies in timings.items():
+        table.add_row(
+            name,
+            str(len(latencies)),
+            f"{sum(latencies):.1f}",
+            f"{statistics.mean(latencies):.2f}",
+            f"{statistics.median(latencies):.2f}",
+        )
+    console.print(table)
+
+    saved = sum(timings["cold"]) - sum(timings["warm"])
+    console.print(f"Compile time saved by a warm cache: {saved:.1f}s ({saved / len(submissions):.2f}s per submission)")
+
+
+if __name__ == "__main__":
+    main()
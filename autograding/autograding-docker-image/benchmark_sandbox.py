@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Compares the per-submission latency of the sandbox backends in utils/sandbox.py.
+
+Each submission directory is checked --repeat times with every backend that is installed, and the latencies are
+summarised in a table. Checks and dist files default to path_to_checks and path_to_dist in the [GRADER] section of
+config.ini.
+
+usage: benchmark_sandbox.py submission_dir [submission_dir ...] [--repeat N] [--sandbox docker --sandbox bwrap]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent.parent))
+from utils.sandbox import (  # pylint:disable=wrong-import-position
+    CHECK50_COMMAND,
+    BubblewrapSandbox,
+    SANDBOXES,
+    get_sandbox,
+)
+from utils import logger  # pylint:disable=wrong-import-position
+
+MODULE_CONFIG_SECTION = "GRADER"
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("submission_dirs", type=Path, nargs="+")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per submission per backend")
+    parser.add_argument("--sandbox", action="append", choices=SANDBOXES, help="backends to compare, default all")
+    parser.add_argument("--dist", help="instructor files needed to compile, defaults to path_to_dist")
+    parser.add_argument("--checks", help="check50 checks to run, defaults to path_to_checks")
+    return parser.parse_args()
+
+
+def time_backend(sandbox, submission_dirs, repeat):
+    latencies = []
+    for submission_dir in submission_dirs:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stdout = sandbox.run(CHECK50_COMMAND, submission_dir)
+            latencies.append(time.perf_counter() - start)
+            if stdout is None:
+                logger.warning(f"{sandbox.name} timed out on {submission_dir}")
+    return latencies
+
+
+def main():
+    args = parse_args()
+
+    timings = {}
+    for name in args.sandbox or list(SANDBOXES):
+        sandbox = get_sandbox(MODULE_CONFIG_SECTION, name, args.checks, args.dist)
+        executable = sandbox.bwrap_path if isinstance(sandbox, BubblewrapSandbox) else "docker"
+        if not shutil.which(executable):
+            logger.warning(f"Skipping {name}, '{executable}' is not installed")
+            continue
+
+        logger.info(f"Timing {name} over {len(args.submission_dirs)} submissions x {args.repeat}")
+        timings[name] = time_backend(sandbox, args.submission_dirs, args.repeat)
+
+    if not timings:
+        logger.error("No sandbox backends available to benchmark")
+        sys.exit(1)
+
+    baseline = statistics.mean(next(iter(timings.values())))
+    table = Table(title="Per-submission latency (seconds)", header_style="bold magenta")
+    for column in ("Sandbox", "Runs", "Mean", "Median", "p95", "Min", "Max", "Speed-up"):
+        table.add_column(column)
+    for name, latencies in timings.items():
+        ordered = sorted(latencies)
+        mean = statistics.mean(ordered)
+        table.add_row(
+            name,
+            str(len(ordered)),
+            f"{mean:.2f}",
+            f"{statistics.median(ordered):.2f}",
+            f"{ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]:.2f}",
+            f"{ordered[0]:.2f}",
+            f"{ordered[-1]:.2f}",
+            f"{baseline / mean:.1f}x",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Runs the check50 checks over a single submission and prints check50's JSON output.
+
+This does the same job as run_docker_check.sh, but in whichever sandbox is configured in the [GRADER] section of
+config.ini (see utils/sandbox.py), so the same submission can be checked with docker or with bubblewrap.
+"""
+import argparse
+import sys
+import os
+from pathlib import Path
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent.parent))
+from utils.sandbox import (  # pylint:disable=wrong-import-position
+    CHECK50_COMMAND,
+    SANDBOXES,
+    get_sandbox,
+)
+
+MODULE_CONFIG_SECTION = "GRADER"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("submission_dir", type=Path)
+    parser.add_argument("--dist", help="instructor files needed to compile, defaults to path_to_dist")
+    parser.add_argument("--checks", help="check50 checks to run, defaults to path_to_checks")
+    parser.add_argument("--sandbox", choices=SANDBOXES, help="overrides the sandbox set in config.ini")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sandbox = get_sandbox(MODULE_CONFIG_SECTION, args.sandbox, args.checks, args.dist)
+    stdout = sandbox.run(CHECK50_COMMAND, args.submission_dir)
+    if stdout is None:
+        sys.exit(1)
+    sys.stdout.buffer.write(stdout)
+
+
+if __name__ == "__main__":
+    main()
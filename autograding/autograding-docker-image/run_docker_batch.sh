@@ -0,0 +1,42 @@
+#!/bin/bash
+# Checks every submission under submissions_root in a single container, writing <submission>.json to output_dir.
+# The manifest lists one submission directory per line, relative to submissions_root. Without one, every directory
+# directly under submissions_root is checked. The results are written by the container's root process, not the cs50 user
+# that runs student code, and are given to whoever owns output_dir.
+if [ "$#" -lt 4 ]; then
+    echo "usage: run_docker_batch.sh submissions_root output_dir dist_files_dir check50_checks_dir [manifest]"
+    exit 1
+fi
+
+function abspath {
+    if [[ -d "$1" ]]; then
+        pushd "$1" >/dev/null
+        pwd
+        popd >/dev/null
+    elif [[ -e "$1" ]]; then
+        pushd "$(dirname "$1")" >/dev/null
+        echo "$(pwd)/$(basename "$1")"
+        popd >/dev/null
+    else
+        echo "$1" does not exist! >&2
+        return 127
+    fi
+}
+
+mkdir -p "$2"
+PATH_TO_SUBMISSIONS=$(abspath $1)
+PATH_TO_OUTPUT=$(abspath $2)
+PATH_TO_DISTRIBUTED_CODE=$(abspath $3)
+PATH_TO_CS50_CHECKS=$(abspath $4)
+
+if [ -n "$5" ]; then
+    PATH_TO_MANIFEST=$(abspath $5)
+else
+    PATH_TO_MANIFEST=$(mktemp)
+    trap 'rm -f "$PATH_TO_MANIFEST"' EXIT
+    (cd "$PATH_TO_SUBMISSIONS" && ls -d */) > "$PATH_TO_MANIFEST"
+    # mktemp creates it readable only by us, and the container's root need not be us (e.g. with userns-remap)
+    chmod 644 "$PATH_TO_MANIFEST"
+fi
+
+docker run --volume=$PATH_TO_CS50_CHECKS:/opt/check_files --volume=$PATH_TO_SUBMISSIONS:/submissions:ro --volume=$PATH_TO_DISTRIBUTED_CODE:/dist --volume=$PATH_TO_MANIFEST:/manifest.txt:ro --volume=$PATH_TO_OUTPUT:/output --volume=check50-cache:/cache --init --rm shaananc/check50 batch /manifest.txt
@@ -21,4 +21,4 @@ function abspath {
 PATH_TO_STUDENT_CODE=$(abspath $1)
 PATH_TO_DISTRIBUTED_CODE=$(abspath $2)
 PATH_TO_CS50_CHECKS=$(abspath $3)
-docker run --volume=$PATH_TO_CS50_CHECKS:/opt/check_files --volume=$PATH_TO_STUDENT_CODE:/src --volume=$PATH_TO_DISTRIBUTED_CODE:/dist --rm -ti shaananc/check50 check50 -o json --dev /opt/check_files
+docker run --volume=$PATH_TO_CS50_CHECKS:/opt/check_files --volume=$PATH_TO_STUDENT_CODE:/src --volume=$PATH_TO_DISTRIBUTED_CODE:/dist --volume=check50-cache:/cache --rm -ti shaananc/check50 check50 -o json --dev /opt/check_files
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Runs check50 and style50 over every submission in a cohort and summarises the results.
+
+Any directory under submissions_root that contains .c files is a submission. Its student is the first directory below
+submissions_root, so a download laid out as <root>/<student>/<assignment>/on-time/code/*.c is found without naming the
+path. For each student, results.json (check50) and style.json (style50) are written to their directory under the root.
+
+Check and style jobs run in the sandbox configured in the [GRADER] section of config.ini (see utils/sandbox.py), on a
+worker pool sized like the grader's (max_workers). A job whose output file already holds a readable result is skipped
+unless --force is given, so an interrupted run picks up where it stopped. Finally every student's results are
+written to one cohort CSV, and the pass rate of each check is printed, with the median and 95th percentile CPU time
+and the peak memory of its programs where the checks measured them (see autograding/example1/measure.py).
+
+usage: run_over_submissions.py submissions_root [--csv cohort.csv] [--force] [--sandbox docker|bwrap] [--checks DIR] [--dist DIR]
+"""
+import argparse
+import csv
+import json
+import os
+import math
+import statistics
+import sys
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent.parent))
+from utils import config, logger  # pylint:disable=wrong-import-position
+from utils.sandbox import CHECK50_COMMAND, SANDBOXES, get_sandbox  # pylint:disable=wrong-import-position
+from utils.scheduler import JobScheduler, default_worker_count  # pylint:disable=wrong-import-position
+
+MODULE_CONFIG_SECTION = "GRADER"
+
+RESULTS_FILE = "results.json"
+STYLE_FILE = "style.json"
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("submissions_root", type=Path)
+    parser.add_argument("--csv", type=Path, default=Path("cohort.csv"), help="where to write the cohort table")
+    parser.add_argument("--force", action="store_true", help="rerun students that already have results")
+    parser.add_argument("--dist", help="instructor files needed to compile, defaults to path_to_dist")
+    parser.add_argument("--checks", help="check50 checks to run, defaults to path_to_checks")
+    parser.add_argument("--sandbox", choices=SANDBOXES, help="overrides the sandbox set in config.ini")
+    return parser.parse_args()
+
+
+def discover_submissions(root: Path):
+    """Maps each student's directory under root to the directory holding their C files and the names of those files"""
+    submissions = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        sources = sorted(name for name in filenames if name.endswith(".c"))
+        if dirpath == str(root) or not sources:
+            continue
+        student_dir = root / Path(dirpath).relative_to(root).parts[0]
+        if student_dir in submissions:
+            logger.warning(
+                f"{student_dir.name} has C files in more than one directory, using {submissions[student_dir][0]}"
+            )
+            continue
+        submissions[student_dir] = (Path(dirpath), sources)
+    return submissions
+
+
+def read_json(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: Path, stdout: bytes):
+    """Keeps the previous file if the new output is not JSON, so that a killed job is retried on resume"""
+    try:
+        document = json.loads(stdout)
+    except ValueError:
+        logger.error(f"Not writing {path}, the output was not JSON")
+        return None
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(document, f, indent=4)
+    os.replace(tmp_path, path)
+    return document
+
+
+def is_complete(kind: str, student_dir: Path) -> bool:
+    if kind == "check":
+        return "results" in (read_json(student_dir / RESULTS_FILE) or {})
+    return "score" in (read_json(student_dir / STYLE_FILE) or {})
+
+
+def make_job(sandbox):
+    def run_job(job):
+        kind, student_dir, code_dir, sources = job
+        if kind == "check":
+            command, output = CHECK50_COMMAND, student_dir / RESULTS_FILE
+        else:
+            # the student's own files as discovered, not whatever else is in code_dir by the time this runs
+            command, output = ["style50", "-o", "json", *sources], student_dir / STYLE_FILE
+
+        stdout = sandbox.run(command, code_dir)
+        if stdout is None:
+            return None
+        return write_json(output, stdout)
+
+    return run_job
+
+
+def summarise(students):
+    """One row per student with whether each check passed, and the name of every check in the order first seen"""
+    check_names = []
+    rows = []
+    for student_dir in students:
+        results = read_json(student_dir / RESULTS_FILE) or {}
+        style = read_json(student_dir / STYLE_FILE) or {}
+        row = {"student": student_dir.name, "style_score": style.get("score"), "resources": {}}
+        for result in results.get("results", []):
+            if result["name"] not in check_names:
+                check_names.append(result["name"])
+            row[result["name"]] = result["passed"]
+            # what the check's programs used, as measured by example1's measure.py, summed over the programs it ran
+            usages = ((result.get("data") or {}).get("resources") or {}).values()
+            if usages:
+                row["resources"][result["name"]] = (
+                    sum(usage["user_seconds"] + usage["sys_seconds"] for usage in usages),
+                    max(usage["max_rss_kb"] for usage in usages),
+                )
+        if "error" in results:
+            row["error"] = results["error"].get("value", "")
+        rows.append(row)
+    return check_names, rows
+
+
+def write_cohort_csv(path: Path, check_names, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["student", *check_names, "checks_passed", "style_score", "error"])
+        for row in rows:
+            writer.writerow(
+                [
+                    row["student"],
+                    *(row.get(name, "") for name in check_names),
+                    sum(row.get(name) is True for name in check_names),
+                    row["style_score"] if row["style_score"] is not None else "",
+                    row.get("error", ""),
+                ]
+            )
+
+
+def percentile(values, q: float):
+    """The q'th percentile of values by the nearest-rank method"""
+    values = sorted(values)
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def summary_table(check_names, rows) -> Table:
+    table = Table(title=f"Cohort results ({len(rows)} students)", header_style="bold magenta")
+    for column in ("Check", "Passed", "Failed", "Skipped", "Pass rate", "Median CPU", "p95 CPU", "Max memory"):
+        table.add_column(column)
+    for name in check_names:
+        outcomes = [row[name] for row in rows if name in row]
+        passed = sum(outcome is True for outcome in outcomes)
+        usages = [row["resources"][name] for row in rows if name in row["resources"]]
+        cpu = [cpu_seconds for cpu_seconds, _ in usages]
+        table.add_row(
+            name,
+            str(passed),
+            str(sum(outcome is False for outcome in outcomes)),
+            str(sum(outcome is None for outcome in outcomes)),
+            f"{100 * passed / len(rows):.0f}%" if rows else "-",
+            f"{statistics.median(cpu):.2f}s" if cpu else "-",
+            f"{percentile(cpu, 95):.2f}s" if cpu else "-",
+            f"{max(rss_kb for _, rss_kb in usages) / 1024:.1f} MB" if usages else "-",
+        )
+
+    scores = [row["style_score"] for row in rows if row["style_score"] is not None]
+    if scores:
+        table.caption = f"Mean style50 score {statistics.mean(scores):.2f} over {len(scores)} students"
+    return table
+
+
+def main():
+    args = parse_args()
+    sandbox = get_sandbox(MODULE_CONFIG_SECTION, args.sandbox, args.checks, args.dist)
+
+    submissions = discover_submissions(args.submissions_root)
+    logger.info(f"Found {len(submissions)} submissions under {args.submissions_root}")
+
+    jobs = {}
+    for student_dir, (code_dir, sources) in submissions.items():
+        for kind in ("check", "style"):
+            if args.force or not is_complete(kind, student_dir):
+                jobs[(kind, student_dir.name)] = (kind, student_dir, code_dir, sources)
+    logger.info(f"{len(jobs)} jobs to run, {2 * len(submissions) - len(jobs)} already have results")
+
+    workers = config.getint(MODULE_CONFIG_SECTION, "max_workers", fallback=0)
+    workers = workers or default_worker_count(sandbox.limits.cpus, sandbox.limits.memory)
+    JobScheduler(make_job(sandbox), workers, "[red]Checking submissions...").run_all(jobs)
+
+    check_names, rows = summarise(submissions)
+    write_cohort_csv(args.csv, check_names, rows)
+    logger.info(f"Wrote results for {len(rows)} students to {args.csv}")
+    console.print(summary_table(check_names, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
 import check50
 import check50.c
+import hashlib
+import json
 import os.path
 from os import path
 import os
+import sys
+import tempfile
+import pycparser
 from pycparser import c_ast, parse_file, c_generator
 import pycparser_fake_libc
 
+# check50 loads this file by path, so its helper modules are not importable until this directory is on the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compare import run_and_compare  # pylint:disable=wrong-import-position
+from fuzz import get_reference_path, has_reference, run_fuzzer  # pylint:disable=wrong-import-position
+from measure import measured, measured_args, record  # pylint:disable=wrong-import-position
+
+CPP_PATH = "/usr/local/opt/llvm/bin/clang"
+
+# parsed function bodies, shared by every check in a run (each runs in its own process) and by later runs over the same
+# files. /cache is the volume the shaananc/check50 image shares between containers
+FUNCTION_CACHE_DIR = os.environ.get("FUNCTION_CACHE_DIR", "/cache/functions")
+
 
 class FuncDefVisitor(c_ast.NodeVisitor):
     def __init__(self, bodies):
@@ -17,49 +34,123 @@ class FuncDefVisitor(c_ast.NodeVisitor):
 
 
 def get_functions(filename):
-    fake_libc_arg = "-I" + pycparser_fake_libc.directory
-    ast = parse_file(
-        filename,
-        use_cpp=True,
-        cpp_path="/usr/local/opt/llvm/bin/clang",
-        cpp_args=[r"-E", fake_libc_arg],
-    )
-
+    """Maps the name of every function defined in filename to its source, parsing the file only if its contents have
+    not been parsed before"""
+    cpp_args = [r"-E", "-I" + pycparser_fake_libc.directory]
+    with open(filename, "rb") as f:
+        key = hashlib.sha256(f.read())
+    key.update(json.dumps([CPP_PATH, cpp_args, pycparser.__version__]).encode())
+    cache_path = os.path.join(FUNCTION_CACHE_DIR, f"{key.hexdigest()}.json")
+
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    ast = parse_file(filename, use_cpp=True, cpp_path=CPP_PATH, cpp_args=cpp_args)
     bodies = {}
     v = FuncDefVisitor(bodies)
     v.visit(ast)
+
+    _write_cache(cache_path, bodies)
     return bodies
 
 
-def get_correct_output(qnum: int):
-    with open(f"{os.path.dirname(__file__)}/data/output_{qnum}.txt") as f:
-        return f.read()
+def _write_cache(cache_path: str, bodies):
+    """Writes to a temporary file and renames it, so that a check reading concurrently never sees half an entry"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(bodies, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # without a writable cache every check just parses for itself, as before
+        pass
+
+
+def compile_cached(*sources, exe_name):
+    """Compiles each source to an object with its own `clang -c`, then links them into exe_name.
+
+    ccache (set up in the shaananc/check50 image) can only cache single-file compiles, so unlike check50.c.compile
+    this lets the cache skip the instructor drivers, which are the same for every student, and any repeated submission.
+    """
+    objects = []
+    for source in sources:
+        obj = f"{os.path.splitext(os.path.basename(source))[0]}.o"
+        _run_compiler(f"{check50.c.CC} -c -std=c11 -ggdb {source} -o {obj}")
+        objects.append(obj)
+    _run_compiler(f"{check50.c.CC} {' '.join(objects)} -o {exe_name} -lm")
+
+
+def _run_compiler(command: str):
+    process = check50.run(command)
+    output = process.stdout()
+    # stdout() waits for the compiler to finish, after which exit() can no longer be asked
+    if process.exitcode != 0:
+        for line in output.splitlines()[:50]:
+            check50.log(line)
+        raise check50.Failure("code failed to compile")
+
+
+def write_student_functions(bodies, filename: str):
+    """Writes every function the student defined other than main, so they can be linked against a driver"""
+    with open(filename, "w") as f:
+        # the bodies come from the preprocessed file, so their #includes need restoring for them to compile alone
+        f.write("#include <stdio.h>\n#include <stdlib.h>\n#include <string.h>\n#include <math.h>\n\n")
+        for k, v in bodies.items():
+            if "main" not in k:
+                f.write(v)
 
 
-def generate_q2_code():
-    bodies = {}
+def get_correct_output_path(qnum: int) -> str:
+    return f"{os.path.dirname(__file__)}/data/output_{qnum}.txt"
+
+
+def get_q2_qnum() -> int:
+    """q2 has two variants, told apart by which question's answer the student submitted"""
     if path.exists("794902.c"):
-        bodies = get_functions("794902.c")
+        return 794902
     elif path.exists("794907.c"):
-        bodies = get_functions("794907.c")
+        return 794907
     else:
         raise FileNotFoundError
 
-    with open("q2.c", "w") as f:
-        for k, v in bodies.items():
-            if "main" not in k:
-                f.write(v)
-        with open(f"{os.path.dirname(__file__)}/data/q2_driver.c") as f2:
-            f.write(f2.read())
+
+def generate_q2_code():
+    write_student_functions(get_functions(f"{get_q2_qnum()}.c"), "q2.c")
+
+
+def compile_fuzzer(student_source: str, qnum: int, qname: str):
+    """Links the student's functions with question qnum's reference and qname's driver into ./<qname>_fuzz"""
+    driver = f"{os.path.dirname(__file__)}/data/{qname}_fuzz.c"
+    compile_cached(student_source, driver, get_reference_path(qnum), exe_name=f"{qname}_fuzz")
+
+
+def build_fuzzer(student_source: str, qnum: int, qname: str) -> bool:
+    """Builds ./<qname>_fuzz if question qnum has a reference, returning whether there is one to run.
+
+    The student's functions already linked with the fixed driver in the compile check, so a differential test that
+    does not build is a problem with the reference or its driver: the check logs it and keeps its fixed case.
+    """
+    if not has_reference(qnum):
+        return False
+    try:
+        compile_fuzzer(student_source, qnum, qname)
+    except check50.Failure as e:
+        check50.log(f"not running the differential test, it did not build ({e})")
+        return False
+    return True
 
 
 @check50.check()
 def q1_compiles():
     """q1 compiles"""
     if path.exists("794901.c"):
-        check50.c.compile("794901.c", exe_name="q1")
+        compile_cached("794901.c", exe_name="q1")
     elif path.exists("794904.c"):
-        check50.c.compile("794904.c", exe_name="q1")
+        compile_cached("794904.c", exe_name="q1")
     else:
         raise FileNotFoundError
 
@@ -67,52 +158,52 @@ def q1_compiles():
 @check50.check(q1_compiles)
 def q1_io():
     """prints a tree"""
-    correct_output = ""
     if path.exists("794901.c"):
-        correct_output = get_correct_output(794901)
+        correct_output = get_correct_output_path(794901)
     elif path.exists("794904.c"):
-        correct_output = get_correct_output(794904)
+        correct_output = get_correct_output_path(794904)
     else:
         raise FileNotFoundError
-    check50.run("./q1 <<< 4").stdout(correct_output, regex=False).exit(0)
+    try:
+        run_and_compare(measured_args(["./q1"], "q1.usage.json"), correct_output, stdin="4\n")
+    finally:
+        record("q1", "q1.usage.json")
 
 
 @check50.check()
 def q2_compiles():
     """q2 compiles"""
     generate_q2_code()
-    check50.c.compile("q2.c")
+    compile_cached("q2.c", f"{os.path.dirname(__file__)}/data/q2_driver.c", exe_name="q2")
 
 
-## use some novel test case instead
 @check50.check(q2_compiles)
 def q2_io():
     """does secret math"""
-    correct_output = ""
-    if path.exists("794902.c"):
-        correct_output = "8"
-    elif path.exists("794907.c"):
-        correct_output = "12"
-    else:
-        raise FileNotFoundError
-    check50.run("./q2").stdout(correct_output, regex=False).exit(0)
+    if build_fuzzer("q2.c", get_q2_qnum(), "q2"):
+        run_fuzzer("q2_fuzz", "q2")
+        return
+    correct_output = {794902: "8", 794907: "12"}[get_q2_qnum()]
+    try:
+        check50.run(measured("./q2", "q2.usage.json")).stdout(correct_output, regex=False).exit(0)
+    finally:
+        record("q2", "q2.usage.json")
 
 
 @check50.check()
 def q3_compiles():
     """q3 compiles"""
-    bodies = get_functions("788765.c")
-    with open("q3.c", "w") as f:
-        for k, v in bodies.items():
-            if "main" not in k:
-                f.write(v)
-        with open(f"{os.path.dirname(__file__)}/data/q3_driver.c") as f2:
-            f.write(f2.read())
-
-    check50.c.compile("q3.c")
+    write_student_functions(get_functions("788765.c"), "q3.c")
+    compile_cached("q3.c", f"{os.path.dirname(__file__)}/data/q3_driver.c", exe_name="q3")
 
 
 @check50.check(q3_compiles)
 def q3_io():
     """rescues bby"""
-    check50.run("./q3").stdout("98,99,98,98,121,108,3,8,3,", regex=False).exit(0)
+    if build_fuzzer("q3.c", 788765, "q3"):
+        run_fuzzer("q3_fuzz", "q3")
+        return
+    try:
+        check50.run(measured("./q3", "q3.usage.json")).stdout("98,99,98,98,121,108,3,8,3,", regex=False).exit(0)
+    finally:
+        record("q3", "q3.usage.json")
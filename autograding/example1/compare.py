@@ -0,0 +1,223 @@
+"""Compares a program's output with an expected output file, streaming both so that memory stays flat however much a
+program prints.
+
+The comparison stops at the first divergence, which is reported with its line, column and character offset in the
+program's output, plus a few lines of context from each side. Three modes are supported:
+
+- exact: every character must match, as check50's own stdout() does
+- whitespace: the outputs must hold the same words, however they are spaced or split across lines
+- numeric: like whitespace, but words that are both numbers only need to agree to within a tolerance
+"""
+import math
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+from itertools import zip_longest
+from typing import Iterable, Iterator, Optional
+
+import check50
+
+MODES = ("exact", "whitespace", "numeric")
+
+# longest line shown in a context diff, so one huge line cannot blow up the check's JSON
+MAX_CONTEXT_WIDTH = 120
+
+
+@dataclass
+class Divergence:
+    line: int
+    column: int
+    offset: int
+    expected: str
+    actual: str
+    expected_context: str
+    actual_context: str
+
+    def describe(self) -> str:
+        return f"output differs at line {self.line}, column {self.column} (character {self.offset})"
+
+
+def _clip(text: str) -> str:
+    text = text.rstrip("\n")
+    return text if len(text) <= MAX_CONTEXT_WIDTH else text[: MAX_CONTEXT_WIDTH - 3] + "..."
+
+
+class _Reader:
+    """Reads one side line by line, remembering where it is and the last few lines for context"""
+
+    def __init__(self, lines: Iterable[str], context: int):
+        self._lines = iter(lines)
+        self.context = context
+        self.recent = deque(maxlen=context + 1)
+        self.line_no = 0
+        self.offset = 0
+        # where the line after the current one starts, which is the end of the output once it has all been read
+        self.end_offset = 0
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self._lines:
+            self.line_no += 1
+            self.offset = self.end_offset
+            self.end_offset += len(line)
+            self.recent.append(line)
+            yield line
+
+    def next_words(self) -> Optional[list]:
+        """The words on the next line that has any, or None at the end of the output"""
+        for line in self:
+            words = line.split()
+            if words:
+                return words
+        return None
+
+    def column_of(self, word_index: int) -> int:
+        """The column, counting from 1, of the word_index'th word on the current line"""
+        line = self.recent[-1] if self.recent else ""
+        start = end = 0
+        for word in line.split()[: word_index + 1]:
+            start = line.index(word, end)
+            end = start + len(word)
+        return start + 1
+
+    def context_around(self) -> str:
+        """The line being compared, the lines before it, and up to context lines after it"""
+        after = [line for _, line in zip(range(self.context), self._lines)]
+        return "\n".join(_clip(line) for line in [*self.recent, *after])
+
+
+def _numbers_match(expected: str, actual: str, tolerance: float) -> bool:
+    try:
+        e, a = float(expected), float(actual)
+    except ValueError:
+        return expected == actual
+    return math.isclose(e, a, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def _first_difference(expected: str, actual: str) -> int:
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if e != a:
+            return i
+    return min(len(expected), len(actual))
+
+
+def _divergence(
+    expected: _Reader, actual: _Reader, column: int, expected_text: str, actual_text: str, actual_ended: bool = False
+) -> Divergence:
+    if actual_ended:
+        # the output stopped short, so it diverges where its next line would have started
+        line, offset = actual.line_no + 1, actual.end_offset
+    else:
+        line, offset = actual.line_no, actual.offset + column - 1
+    return Divergence(
+        line=line,
+        column=column,
+        offset=offset,
+        expected=_clip(expected_text),
+        actual=_clip(actual_text),
+        expected_context=expected.context_around(),
+        actual_context=actual.context_around(),
+    )
+
+
+def compare(
+    expected_lines: Iterable[str],
+    actual_lines: Iterable[str],
+    mode: str = "exact",
+    tolerance: float = 1e-6,
+    context: int = 2,
+) -> Optional[Divergence]:
+    """Returns where actual_lines first diverges from expected_lines, or None if they match under mode"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown comparison mode '{mode}', expected one of {', '.join(MODES)}")
+
+    expected, actual = _Reader(expected_lines, context), _Reader(actual_lines, context)
+    if mode == "exact":
+        for e, a in zip_longest(expected, actual):
+            if e != a:
+                column = _first_difference(e or "", a or "") + 1
+                e_text, a_text = e or "EOF", a or "EOF"
+                if e and a and column > min(len(e.rstrip("\n")), len(a.rstrip("\n"))):
+                    # the lines differ only from where one of them ends, e.g. a missing or extra newline, which _clip
+                    # would hide, so show their endings
+                    e_text, a_text = repr(e), repr(a)
+                return _divergence(expected, actual, column, e_text, a_text, actual_ended=a is None)
+        return None
+
+    # words are compared a line at a time, lines of words can be compared as lists far faster than word by word
+    e_words, a_words, e_pos, a_pos = [], [], 0, 0
+    while True:
+        if e_words is not None and e_pos == len(e_words):
+            e_words, e_pos = expected.next_words(), 0
+        if a_words is not None and a_pos == len(a_words):
+            a_words, a_pos = actual.next_words(), 0
+        if e_words is None or a_words is None:
+            if e_words is a_words:
+                return None
+            column = 1 if a_words is None else actual.column_of(a_pos)
+            return _divergence(
+                expected,
+                actual,
+                column,
+                "EOF" if e_words is None else e_words[e_pos],
+                "EOF" if a_words is None else a_words[a_pos],
+                actual_ended=a_words is None,
+            )
+
+        n = min(len(e_words) - e_pos, len(a_words) - a_pos)
+        if e_words[e_pos : e_pos + n] != a_words[a_pos : a_pos + n]:
+            for i in range(n):
+                e, a = e_words[e_pos + i], a_words[a_pos + i]
+                # only parse numbers for the words that differ
+                if e != a and (mode == "whitespace" or not _numbers_match(e, a, tolerance)):
+                    return _divergence(expected, actual, actual.column_of(a_pos + i), e, a)
+        e_pos, a_pos = e_pos + n, a_pos + n
+
+
+def run_and_compare(
+    command,
+    expected_path: str,
+    stdin: str = "",
+    mode: str = "exact",
+    tolerance: float = 1e-6,
+    context: int = 2,
+):
+    """Runs command, comparing its stdout with the file at expected_path as it is printed.
+
+    Raises check50.Mismatch at the first divergence, and check50.Failure if the program does not exit with 0. The time
+    limit is the check's own, check50 interrupts the read when it runs out.
+    """
+    check50.log(f"running {' '.join(command)}...")
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors="replace"
+    )
+    try:
+        # the input is small, the output is what needs streaming
+        try:
+            process.stdin.write(stdin)
+            process.stdin.close()
+        except BrokenPipeError:
+            # the program exited without reading its input, its output is still worth comparing
+            pass
+        with open(expected_path) as expected_file:
+            divergence = compare(expected_file, process.stdout, mode, tolerance, context)
+        if divergence is None:
+            exit_code = process.wait()
+    finally:
+        # terminate rather than kill, so that a wrapper such as measure.py can pass it on to the program
+        process.terminate()
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    if divergence is not None:
+        check50.log(divergence.describe())
+        mismatch = check50.Mismatch(divergence.expected_context, divergence.actual_context, help=divergence.describe())
+        # Mismatch would summarise the context, which is truncated to the same prefix on both sides
+        mismatch.payload["rationale"] = f"expected {divergence.expected!r}, not {divergence.actual!r}"
+        raise mismatch
+
+    check50.log("checking that program exited with status 0...")
+    if exit_code != 0:
+        raise check50.Failure(f"expected exit code 0, not {exit_code}")
@@ -0,0 +1,176 @@
+/* Differential testing harness: runs thousands of random inputs through a student's function and a reference
+ * implementation in one process, stopping at the first input where they disagree.
+ *
+ * A driver includes this file first, then defines fuzz_case, which generates one input with the fuzz_* helpers,
+ * describes it in fuzz_input *before* calling the student's function (so a crash can still report it), calls both
+ * implementations, and returns nonzero if they agree. On disagreement it fills fuzz_expected and fuzz_actual.
+ *
+ * usage: ./driver [iterations] [seed] [seconds]
+ *
+ * Exactly one line is written to stdout, as tab separated fields:
+ *   PASS    iterations
+ *   FAIL    input  expected  actual
+ *   CRASH   signal input
+ *   TIMEOUT input                      (the whole run took longer than seconds)
+ *   EXIT    input                      (the student's function called exit)
+ * Anything the student's function prints is discarded, and it reads from /dev/null.
+ */
+#define _XOPEN_SOURCE 700
+
+#include <fcntl.h>
+#include <signal.h>
+#include <stdarg.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#define FUZZ_TEXT 4096
+
+static char fuzz_input[FUZZ_TEXT], fuzz_expected[FUZZ_TEXT], fuzz_actual[FUZZ_TEXT];
+static uint64_t fuzz_state = 1;
+static int fuzz_out = STDOUT_FILENO;
+static volatile sig_atomic_t fuzz_finished = 0;
+
+int fuzz_case(void);
+
+/* xorshift64*, so every platform sees the same inputs for the same seed */
+static inline uint64_t fuzz_next(void)
+{
+    fuzz_state ^= fuzz_state >> 12;
+    fuzz_state ^= fuzz_state << 25;
+    fuzz_state ^= fuzz_state >> 27;
+    return fuzz_state * 0x2545F4914F6CDD1DULL;
+}
+
+/* a uniform integer in [lo, hi], returning lo, hi or 0 more often since that is where the bugs are */
+static inline long fuzz_int(long lo, long hi)
+{
+    switch (fuzz_next() % 16)
+    {
+    case 0:
+        return lo;
+    case 1:
+        return hi;
+    case 2:
+        if (lo <= 0 && 0 <= hi)
+        {
+            return 0;
+        }
+    }
+    return lo + (long)(fuzz_next() % (uint64_t)(hi - lo + 1));
+}
+
+/* one character of choices */
+static inline char fuzz_choice(const char *choices)
+{
+    return choices[fuzz_next() % strlen(choices)];
+}
+
+/* printf onto the end of buf, which is one of fuzz_input, fuzz_expected or fuzz_actual */
+static inline void fuzz_append(char *buf, const char *format, ...)
+{
+    size_t used = strlen(buf);
+    va_list args;
+    va_start(args, format);
+    vsnprintf(buf + used, FUZZ_TEXT - used, format, args);
+    va_end(args);
+}
+
+/* only async-signal-safe calls from here until main */
+static void fuzz_write(const char *s)
+{
+    ssize_t ignored = write(fuzz_out, s, strlen(s));
+    (void)ignored;
+}
+
+static const char *fuzz_signal_name(int signum)
+{
+    switch (signum)
+    {
+    case SIGSEGV:
+        return "segmentation fault";
+    case SIGBUS:
+        return "bus error";
+    case SIGFPE:
+        return "floating point exception";
+    case SIGILL:
+        return "illegal instruction";
+    case SIGABRT:
+        return "aborted";
+    }
+    return "signal";
+}
+
+static void fuzz_on_signal(int signum)
+{
+    if (signum == SIGALRM)
+    {
+        fuzz_write("TIMEOUT\t");
+    }
+    else
+    {
+        fuzz_write("CRASH\t");
+        fuzz_write(fuzz_signal_name(signum));
+        fuzz_write("\t");
+    }
+    fuzz_write(fuzz_input);
+    fuzz_write("\n");
+    _exit(2);
+}
+
+static void fuzz_on_exit(void)
+{
+    if (!fuzz_finished)
+    {
+        fuzz_write("EXIT\t");
+        fuzz_write(fuzz_input);
+        fuzz_write("\n");
+    }
+}
+
+static void fuzz_install_handlers(unsigned seconds)
+{
+    /* an alternate stack, so that unbounded recursion in the student's function is still reported */
+    static char stack[1 << 16];
+    stack_t alt = {.ss_sp = stack, .ss_size = sizeof(stack)};
+    sigaltstack(&alt, NULL);
+
+    struct sigaction action = {.sa_handler = fuzz_on_signal, .sa_flags = SA_ONSTACK};
+    int signals[] = {SIGSEGV, SIGBUS, SIGFPE, SIGILL, SIGABRT, SIGALRM};
+    for (size_t i = 0; i < sizeof(signals) / sizeof(signals[0]); i++)
+    {
+        sigaction(signals[i], &action, NULL);
+    }
+    atexit(fuzz_on_exit);
+    alarm(seconds);
+}
+
+int main(int argc, char **argv)
+{
+    long iterations = argc > 1 ? strtol(argv[1], NULL, 10) : 10000;
+    fuzz_state = argc > 2 ? strtoull(argv[2], NULL, 10) | 1 : 1;
+    unsigned seconds = argc > 3 ? (unsigned)strtoul(argv[3], NULL, 10) : 10;
+
+    fuzz_out = dup(STDOUT_FILENO);
+    int devnull = open("/dev/null", O_RDWR);
+    dup2(devnull, STDIN_FILENO);
+    dup2(devnull, STDOUT_FILENO);
+    close(devnull);
+    fuzz_install_handlers(seconds);
+
+    for (long i = 0; i < iterations; i++)
+    {
+        fuzz_input[0] = fuzz_expected[0] = fuzz_actual[0] = '\0';
+        if (!fuzz_case())
+        {
+            fuzz_finished = 1;
+            dprintf(fuzz_out, "FAIL\t%s\t%s\t%s\n", fuzz_input, fuzz_expected, fuzz_actual);
+            return 1;
+        }
+    }
+    fuzz_finished = 1;
+    dprintf(fuzz_out, "PASS\t%ld\n", iterations);
+    return 0;
+}
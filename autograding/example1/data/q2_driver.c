@@ -1,6 +1,9 @@
 #include <stdio.h>
 #include <math.h>
 
+/* the student's function is compiled separately and linked in, so declare the signature the question asks for */
+int secret_math(int a, int b, int c, int d);
+
 int main(int argc, char **argv)
 {
     printf("%d\n", secret_math(5, 2, 3, 7));
@@ -0,0 +1,22 @@
+#include "fuzz.h"
+
+/* the student's function is compiled separately and linked in, as is the reference for the student's variant of the
+ * question, which names its function ref_secret_math */
+int secret_math(int a, int b, int c, int d);
+int ref_secret_math(int a, int b, int c, int d);
+
+int fuzz_case(void)
+{
+    int a = fuzz_int(-1000, 1000), b = fuzz_int(-1000, 1000), c = fuzz_int(-1000, 1000), d = fuzz_int(-1000, 1000);
+    fuzz_append(fuzz_input, "secret_math(%d, %d, %d, %d)", a, b, c, d);
+
+    int expected = ref_secret_math(a, b, c, d);
+    int actual = secret_math(a, b, c, d);
+    if (expected == actual)
+    {
+        return 1;
+    }
+    fuzz_append(fuzz_expected, "%d", expected);
+    fuzz_append(fuzz_actual, "%d", actual);
+    return 0;
+}
@@ -2,6 +2,9 @@
 #include <string.h>
 #include <math.h>
 
+/* the student's function is compiled separately and linked in, so declare the signature the question asks for */
+void find_bby(char rooms[], int n);
+
 int main(int argc, char **argv)
 {
     char rooms[] = {'b', 'c', 3, 8, 3, 'l', 'b', 'b', 'y'};
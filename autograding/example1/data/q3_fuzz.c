@@ -0,0 +1,40 @@
+#include "fuzz.h"
+
+#define MAX_ROOMS 64
+
+/* the student's function is compiled separately and linked in, as is the reference, which names its function
+ * ref_find_bby */
+void find_bby(char rooms[], int n);
+void ref_find_bby(char rooms[], int n);
+
+static void describe(char *buf, const char rooms[], int n)
+{
+    for (int i = 0; i < n; i++)
+    {
+        fuzz_append(buf, "%d,", rooms[i]);
+    }
+}
+
+int fuzz_case(void)
+{
+    /* mostly the letters of bby, so that the pattern turns up often */
+    int n = (int)fuzz_int(0, MAX_ROOMS);
+    char expected[MAX_ROOMS], actual[MAX_ROOMS];
+    for (int i = 0; i < n; i++)
+    {
+        expected[i] = actual[i] = fuzz_int(0, 3) ? fuzz_choice("bbyc") : (char)fuzz_int(0, 9);
+    }
+    fuzz_append(fuzz_input, "find_bby({");
+    describe(fuzz_input, expected, n);
+    fuzz_append(fuzz_input, "}, %d)", n);
+
+    ref_find_bby(expected, n);
+    find_bby(actual, n);
+    if (memcmp(expected, actual, n) == 0)
+    {
+        return 1;
+    }
+    describe(fuzz_expected, expected, n);
+    describe(fuzz_actual, actual, n);
+    return 0;
+}
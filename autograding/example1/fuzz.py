@@ -0,0 +1,63 @@
+"""Differential testing of a student's function against a reference implementation.
+
+The student's extracted functions, a reference implementation and a driver built on data/fuzz.h are linked into one
+executable, which runs thousands of generated inputs through both implementations in a single process and stops at the
+first input where they disagree. That input is what the check reports, in place of a single fixed case.
+
+A reference for question qnum lives at data/reference_<qnum>.c, next to that question's expected output, and defines
+the question's function with ref_ prepended to its name. Questions without one keep their fixed case.
+"""
+import os
+
+import check50
+
+from measure import measured, record
+
+# the same inputs for every student, so that a failing input can be rerun by hand with the same seed
+DEFAULT_SEED = 1
+DEFAULT_ITERATIONS = 10000
+# the whole run's time limit, enforced by the driver so that it can still say which input it was stuck on
+DEFAULT_SECONDS = 10
+
+
+def get_reference_path(qnum: int) -> str:
+    return f"{os.path.dirname(__file__)}/data/reference_{qnum}.c"
+
+
+def has_reference(qnum: int) -> bool:
+    return os.path.exists(get_reference_path(qnum))
+
+
+def run_fuzzer(
+    exe_name: str,
+    label: str,
+    iterations: int = DEFAULT_ITERATIONS,
+    seed: int = DEFAULT_SEED,
+    seconds: int = DEFAULT_SECONDS,
+):
+    """Runs a driver built on data/fuzz.h, raising check50.Mismatch or check50.Failure for the first failing input"""
+    usage_file = f"{label}.usage.json"
+    try:
+        output = check50.run(measured(f"./{exe_name} {iterations} {seed} {seconds}", usage_file)).stdout(
+            timeout=seconds + 5
+        )
+    finally:
+        record(label, usage_file)
+
+    lines = [line for line in output.splitlines() if line]
+    verdict, *fields = lines[-1].split("\t") if lines else ["", ""]
+    if verdict == "PASS":
+        check50.log(f"{fields[0]} random inputs (seed {seed}) agreed with the reference")
+    elif verdict == "FAIL":
+        check50.log(f"failed for {fields[0]}")
+        raise check50.Mismatch(fields[1], fields[2], help=f"for {fields[0]}")
+    elif verdict == "CRASH":
+        raise check50.Failure(f"{fields[0]} for {fields[1]}")
+    elif verdict == "TIMEOUT":
+        raise check50.Failure(f"did not finish {iterations} inputs within {seconds}s, was running {fields[0]}")
+    elif verdict == "EXIT":
+        raise check50.Failure(f"called exit for {fields[0]}")
+    else:
+        for line in lines[-10:]:
+            check50.log(line)
+        raise check50.Failure("the differential test did not report a result")
@@ -0,0 +1,91 @@
+"""Measures the CPU time, wall time and peak memory of a student's program, and attaches them to the check's result.
+
+check50.run reaps the programs it starts itself, so their resource usage cannot be collected afterwards. Instead the
+program is started through this file as a wrapper (see measured), which waits for it with os.wait4 and writes the usage
+to a JSON file that record then reads into check50.data. The usage appears in check50's JSON output under
+data.resources, keyed by the label given to record:
+
+    {"user_seconds": 0.01, "sys_seconds": 0.0, "wall_seconds": 0.02, "max_rss_kb": 1408}
+
+usage: measure.py --output FILE -- command [args ...]
+"""
+import argparse
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+
+FORWARDED_SIGNALS = (signal.SIGHUP, signal.SIGINT, signal.SIGTERM)
+
+
+def measured(command: str, output: str) -> str:
+    """The shell command that runs command through the wrapper, writing its usage to output"""
+    return f"{shlex.quote(sys.executable)} {shlex.quote(os.path.abspath(__file__))} --output {shlex.quote(output)} -- {command}"
+
+
+def measured_args(command, output: str):
+    """measured, for a command given as an argument list"""
+    return [sys.executable, os.path.abspath(__file__), "--output", output, "--", *command]
+
+
+def record(label: str, output: str):
+    """Attaches the usage the wrapper wrote to output to this check's result, under data.resources[label]"""
+    import check50  # only the checks need check50, the wrapper runs without it
+
+    try:
+        with open(output) as f:
+            usage = json.load(f)
+    except (OSError, ValueError):
+        # the program was killed before the wrapper could write its usage, e.g. by the check's timeout
+        return None
+    check50.data(resources={label: usage})
+    check50.log(
+        f"{label} used {usage['user_seconds']:.3f}s user, {usage['sys_seconds']:.3f}s sys, "
+        f"{usage['wall_seconds']:.3f}s wall and {usage['max_rss_kb'] / 1024:.1f} MB"
+    )
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command)
+    # check50 stops a program with SIGHUP then SIGINT, which has to reach the program rather than just this wrapper
+    for signum in FORWARDED_SIGNALS:
+        signal.signal(signum, lambda signum, _: process.send_signal(signum))
+
+    _, status, rusage = os.wait4(process.pid, 0)
+    wall_seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "user_seconds": round(rusage.ru_utime, 4),
+                "sys_seconds": round(rusage.ru_stime, 4),
+                "wall_seconds": round(wall_seconds, 4),
+                "max_rss_kb": max_rss_kb,
+            },
+            f,
+        )
+
+    # exit the way the program did, so the check sees the same exit code or signal
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+    sys.exit(os.WEXITSTATUS(status))
+
+
+if __name__ == "__main__":
+    main()
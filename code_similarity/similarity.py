@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Finds near-duplicate answers to each question of a quiz downloaded by download_quiz_questions.
+
+Every answer under {quiz_dir}/by_question/question-N/<user>/ is tokenised as C, with identifiers, numbers and strings
+normalised so that renaming variables does not hide a copy. Overlapping runs of kgram tokens are hashed and winnowed
+(Schleimer et al., "Winnowing: Local Algorithms for Document Fingerprinting") into a set of fingerprints per answer.
+Fingerprints shared by more than max_frequency of a question's answers, such as starter code, are ignored.
+
+Rather than comparing every pair of answers, each answer's fingerprints are summarised by a MinHash signature, and the
+signatures are split into bands for locality sensitive hashing: only answers that agree on every row of some band
+become candidates, and only candidates have their exact Jaccard similarity computed. Pairs at or above threshold are
+written to a CSV ranked by similarity.
+
+--benchmark N runs the same pipeline over synthetic questions of up to N answers, to show how it scales.
+
+This script is supplemented by config.ini, for which a sample is provided (see the [SIMILARITY] section).
+"""
+import argparse
+import csv
+import random
+import re
+import sys
+import os
+import time
+import zlib
+from collections import Counter, defaultdict
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from utils import config, logger  # pylint:disable=wrong-import-position
+
+MODULE_CONFIG_SECTION = "SIMILARITY"
+
+console = Console()
+
+KEYWORDS = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum", "extern",
+    "float", "for", "goto", "if", "int", "long", "register", "return", "short", "signed", "sizeof", "static",
+    "struct", "switch", "typedef", "union", "unsigned", "void", "volatile", "while", "bool", "NULL",
+}
+
+# library calls say something about how an answer works, so unlike the student's own names they are kept
+LIBRARY = {
+    "printf", "scanf", "putchar", "getchar", "puts", "malloc", "calloc", "realloc", "free", "strlen", "strcpy",
+    "strncpy", "strcmp", "strncmp", "strcat", "memcpy", "memset", "qsort", "abs", "sqrt", "pow", "exit", "assert",
+}
+
+TOKEN_RE = re.compile(
+    r"""
+      (?P<skip>//[^\n]*|/\*.*?\*/|\#[^\n]*|\s+)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<number>\.?\d[\w.]*)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^!<>=]=?|.)
+    """,
+    re.S | re.X,
+)
+
+# MinHash is computed modulo this Mersenne prime, small enough that a * x + b cannot overflow 64 bits
+PRIME = (1 << 31) - 1
+
+
+def tokenize(source: str):
+    """The tokens of a C source file, with comments, preprocessor lines and the student's own names dropped"""
+    tokens = []
+    for match in TOKEN_RE.finditer(source):
+        kind, text = match.lastgroup, match.group()
+        if kind == "skip":
+            continue
+        if kind == "string":
+            tokens.append("S")
+        elif kind == "number":
+            tokens.append("N")
+        elif kind == "name":
+            tokens.append(text if text in KEYWORDS or text in LIBRARY else "V")
+        else:
+            tokens.append(text)
+    return tokens
+
+
+def fingerprints(tokens, kgram: int, window: int) -> set:
+    """Winnows the hashes of every kgram tokens long run, keeping the smallest hash in each window of them"""
+    hashes = [zlib.crc32(" ".join(tokens[i : i + kgram]).encode()) for i in range(len(tokens) - kgram + 1)]
+    if len(hashes) <= window:
+        return set(hashes)
+
+    selected = set()
+    for i in range(len(hashes) - window + 1):
+        selected.add(min(hashes[i : i + window]))
+    return selected
+
+
+class SimilarityIndex:
+    """Finds the pairs of documents whose fingerprint sets have a Jaccard similarity of at least threshold"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, fingerprint_set: set) -> np.ndarray:
+        x = np.fromiter(fingerprint_set, dtype=np.uint64, count=len(fingerprint_set)) % PRIME
+        return ((self.a * x + self.b) % PRIME).min(axis=1)
+
+    def candidates(self, signatures: dict) -> set:
+        """Pairs of keys whose signatures agree on every row of at least one band"""
+        pairs = set()
+        for band in range(self.bands):
+            buckets = defaultdict(list)
+            rows = slice(band * self.rows, (band + 1) * self.rows)
+            for key, signature in signatures.items():
+                buckets[signature[rows].tobytes()].append(key)
+            for keys in buckets.values():
+                pairs.update(combinations(keys, 2))
+        return pairs
+
+    def similar_pairs(self, documents: dict, threshold: float):
+        """Returns ([(similarity, key_a, key_b, shared)], number of candidate pairs), most similar first"""
+        documents = {key: fps for key, fps in documents.items() if fps}
+        signatures = {key: self.signature(fps) for key, fps in documents.items()}
+        candidates = self.candidates(signatures)
+
+        pairs = []
+        for key_a, key_b in candidates:
+            shared = len(documents[key_a] & documents[key_b])
+            similarity = shared / len(documents[key_a] | documents[key_b])
+            if similarity >= threshold:
+                pairs.append((similarity, *sorted((key_a, key_b)), shared))
+        pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+        return pairs, len(candidates)
+
+
+def drop_common(documents: dict, max_frequency: float) -> dict:
+    """Removes fingerprints found in more than max_frequency of the documents, which are usually starter code"""
+    # with only a handful of answers a single copied pair is already a large share of them
+    if len(documents) < 10:
+        return documents
+    counts = Counter(fp for fps in documents.values() for fp in fps)
+    common = {fp for fp, count in counts.items() if count / len(documents) > max_frequency}
+    return {key: fps - common for key, fps in documents.items()}
+
+
+def read_answers(question_dir: Path):
+    """Maps each user to the text of their answer, joining the files in their directory"""
+    answers = {}
+    for user_dir in sorted(d for d in question_dir.iterdir() if d.is_dir()):
+        answers[user_dir.name] = "\n".join(
+            f.read_text(errors="replace") for f in sorted(user_dir.iterdir()) if f.is_file()
+        )
+    return answers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    quiz_id = config.get("GLOBAL", "quiz_id", fallback="")
+    parser.add_argument("quiz_dir", nargs="?", type=Path, default=Path(f"./{quiz_id}"))
+    parser.add_argument("--question", action="append", help="question-N directories to check, default all")
+    parser.add_argument("--report", type=Path, default=Path("similarity.csv"))
+    parser.add_argument("--benchmark", type=int, metavar="N", help="time the index on synthetic questions up to N")
+    section = MODULE_CONFIG_SECTION
+    parser.add_argument("--threshold", type=float, default=config.getfloat(section, "threshold", fallback=0.5))
+    parser.add_argument("--kgram", type=int, default=config.getint(section, "kgram", fallback=5))
+    parser.add_argument("--window", type=int, default=config.getint(section, "window", fallback=4))
+    parser.add_argument("--num-perm", type=int, default=config.getint(section, "num_perm", fallback=128))
+    parser.add_argument("--bands", type=int, default=config.getint(section, "bands", fallback=32))
+    parser.add_argument(
+        "--max-frequency", type=float, default=config.getfloat(section, "max_frequency", fallback=0.5)
+    )
+    parser.add_argument("--min-tokens", type=int, default=config.getint(section, "min_tokens", fallback=20))
+    return parser.parse_args()
+
+
+def report(args):
+    index = SimilarityIndex(args.num_perm, args.bands)
+    question_dirs = sorted(
+        (d for d in (args.quiz_dir / "by_question").iterdir() if d.is_dir()),
+        key=lambda d: int(d.name.split("-")[-1]) if d.name.split("-")[-1].isdigit() else d.name,
+    )
+    if args.question:
+        question_dirs = [d for d in question_dirs if d.name in args.question]
+
+    rows = []
+    for question_dir in question_dirs:
+        tokens = {user: tokenize(text) for user, text in read_answers(question_dir).items()}
+        documents = {
+            user: fingerprints(t, args.kgram, args.window) for user, t in tokens.items() if len(t) >= args.min_tokens
+        }
+        documents = drop_common(documents, args.max_frequency)
+        pairs, n_candidates = index.similar_pairs(documents, args.threshold)
+        logger.info(
+            f"{question_dir.name}: {len(documents)} answers, {n_candidates} candidate pairs, {len(pairs)} similar"
+        )
+        for similarity, user_a, user_b, shared in pairs:
+            rows.append((question_dir.name, user_a, user_b, similarity, shared, len(tokens[user_a]), len(tokens[user_b])))
+
+    rows.sort(key=lambda row: -row[3])
+    with open(args.report, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["question", "user_a", "user_b", "similarity", "shared_fingerprints", "tokens_a", "tokens_b"])
+        for row in rows:
+            writer.writerow([*row[:3], f"{row[3]:.3f}", *row[4:]])
+    logger.info(f"Wrote {len(rows)} similar pairs to {args.report}")
+
+    table = Table(title="Most similar answers", header_style="bold magenta")
+    for column in ("Question", "User A", "User B", "Similarity", "Shared"):
+        table.add_column(column)
+    for row in rows[:20]:
+        table.add_row(row[0], row[1], row[2], f"{row[3]:.2f}", str(row[4]))
+    console.print(table)
+
+
+def synthetic_question(n: int, rng: random.Random, family_size: int = 5, length: int = 300):
+    """n answers in families of near copies (a few percent of tokens changed), as token lists.
+
+    Also returns every pair of answers from the same family, the pairs a perfect index would consider.
+    """
+    vocabulary = sorted(KEYWORDS | LIBRARY) + list("V" * 20) + list("N" * 5) + list("(){};,=+-*<>[]")
+    answers, family_pairs = {}, []
+    for family in range(0, n, family_size):
+        original = [rng.choice(vocabulary) for _ in range(length)]
+        members = [f"student{family + member:06d}" for member in range(min(family_size, n - family))]
+        for member in members:
+            answers[member] = [rng.choice(vocabulary) if rng.random() < 0.03 else token for token in original]
+        family_pairs += combinations(members, 2)
+    return answers, family_pairs
+
+
+def benchmark(args):
+    rng = random.Random(1)
+    index = SimilarityIndex(args.num_perm, args.bands)
+    table = Table(title="Similarity index scaling", header_style="bold magenta")
+    for column in ("Answers", "Fingerprint (s)", "Index + verify (s)", "Candidates", "All pairs", "Similar", "Recall"):
+        table.add_column(column)
+    table.caption = "Recall is the share of near copies at or above threshold that the index found"
+
+    n = args.benchmark
+    sizes = sorted({max(2, n // 8), max(2, n // 4), max(2, n // 2), n})
+    for size in sizes:
+        answers, family_pairs = synthetic_question(size, rng)
+        start = time.perf_counter()
+        documents = {user: fingerprints(t, args.kgram, args.window) for user, t in answers.items()}
+        fingerprinted = time.perf_counter()
+        pairs, n_candidates = index.similar_pairs(documents, args.threshold)
+        indexed = time.perf_counter()
+
+        # the pairs that are truly similar enough can only be within a family, so they are cheap to find exactly
+        expected = {
+            (a, b)
+            for a, b in family_pairs
+            if len(documents[a] & documents[b]) / len(documents[a] | documents[b]) >= args.threshold
+        }
+        found = {(a, b) for _, a, b, _ in pairs}
+        table.add_row(
+            str(size),
+            f"{fingerprinted - start:.2f}",
+            f"{indexed - fingerprinted:.2f}",
+            str(n_candidates),
+            str(size * (size - 1) // 2),
+            str(len(pairs)),
+            f"{100 * len(found & expected) / len(expected):.1f}%" if expected else "-",
+        )
+    console.print(table)
+
+
+def main():
+    args = parse_args()
+    if args.benchmark:
+        benchmark(args)
+    else:
+        report(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Summarises the stored Grok submissions per student and problem with pandas, and writes tables as CSV or Parquet.
+
+For every student fetched on a problem the summary holds their best npassed, their number of attempts, when they first
+passed every test and how many hours that took from their first attempt. The API does not say how many tests a problem
+has, so passing every test means matching the best npassed anyone in the cohort reached.
+
+Students are told apart by their Grok user id, since two students can share a display name; the name is carried along
+beside it.
+"""
+import pandas as pd
+
+from store import SubmissionStore
+
+METRICS = ("best", "attempts", "first pass", "hours to pass")
+FORMATS = ("csv", "parquet")
+
+# a student's user id and name, name being a column to show rather than part of what tells students apart
+STUDENT = ["user", "name"]
+
+
+def load_submissions(store: SubmissionStore, problems) -> pd.DataFrame:
+    """Every stored submission on problems, with columns user, name, problem, time and npassed"""
+    placeholders = ",".join("?" * len(problems))
+    submissions = pd.read_sql_query(
+        f"""SELECT user, name, problem, time, npassed FROM submissions JOIN students USING (user)
+            WHERE problem IN ({placeholders}) ORDER BY name, user, problem, time""",
+        store.db,
+        params=list(problems),
+    )
+    submissions["time"] = pd.to_datetime(submissions["time"])
+    return submissions
+
+
+def load_fetched(store: SubmissionStore, problems) -> pd.DataFrame:
+    """Every (user, name, problem) fetched, including students who never submitted"""
+    placeholders = ",".join("?" * len(problems))
+    return pd.read_sql_query(
+        f"""SELECT DISTINCT user, name, problem FROM fetched JOIN students USING (user)
+            WHERE problem IN ({placeholders}) ORDER BY name, user, problem""",
+        store.db,
+        params=list(problems),
+    )
+
+
+def summarise(submissions: pd.DataFrame, fetched: pd.DataFrame) -> pd.DataFrame:
+    """One row per student and problem fetched, with the columns in METRICS"""
+    by_student = submissions.groupby([*STUDENT, "problem"])
+    totals = submissions.groupby("problem")["npassed"].transform("max")
+    passes = submissions[(submissions["npassed"] == totals) & (totals > 0)]
+
+    summary = by_student.agg(best=("npassed", "max"), attempts=("npassed", "size"), first_attempt=("time", "min"))
+    summary["first pass"] = passes.groupby([*STUDENT, "problem"])["time"].min()
+    summary["hours to pass"] = (summary["first pass"] - summary["first_attempt"]).dt.total_seconds() / 3600
+
+    summary = fetched.set_index([*STUDENT, "problem"]).join(summary, how="left")
+    summary["best"] = summary["best"].fillna(-1).astype(int)
+    summary["attempts"] = summary["attempts"].fillna(0).astype(int)
+    return summary[list(METRICS)]
+
+
+def widen(summary: pd.DataFrame, problems) -> pd.DataFrame:
+    """One row per student (user and name), with a column for each metric on each problem, in the order problems are
+    given"""
+    wide = summary.unstack("problem").reindex(columns=pd.MultiIndex.from_product([METRICS, problems]))
+    wide = wide[[(metric, problem) for problem in problems for metric in METRICS]]
+    # unstacking leaves a gap where a student was not fetched on a problem, which would make every count a float
+    for metric in ("best", "attempts"):
+        wide[[(metric, problem) for problem in problems]] = wide[[(metric, problem) for problem in problems]].astype("Int64")
+    wide.columns = [f"{problem} {metric}" for metric, problem in wide.columns]
+    return wide.reset_index().sort_values(["name", "user"], ignore_index=True)
+
+
+def cohort_summary(summary: pd.DataFrame) -> pd.DataFrame:
+    """Per problem: how many students were fetched, how many passed every test, and their median attempts and hours"""
+    by_problem = summary.groupby(level="problem")
+    return pd.DataFrame(
+        {
+            "students": by_problem.size(),
+            "passed": by_problem["first pass"].count(),
+            "median attempts": by_problem["attempts"].median(),
+            "median hours to pass": by_problem["hours to pass"].median(),
+        }
+    )
+
+
+def write_table(table: pd.DataFrame, stem: str, fmt: str = "csv") -> str:
+    """Writes table to stem.csv or stem.parquet, returning the path written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {', '.join(FORMATS)}")
+    path = f"{stem}.{fmt}"
+    if fmt == "parquet":
+        # Parquet needs pyarrow or fastparquet, which are not installed with the rest of the requirements
+        table.to_parquet(path, index=False)
+    else:
+        table.to_csv(path, index=False)
+    return path
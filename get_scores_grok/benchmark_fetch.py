@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Compares how get_scores_api.py used to fetch submission histories with the asyncio engine in grok_utils/fetcher.py.
+
+Both fetch the same users from a local stub of Grok's API, which answers every request after --latency seconds. The
+old approach queues one FuturesSession future per user (sleeping 0.3s after every tenth, as the script did) and only
+then writes results, the new one keeps --concurrency requests in flight over one pooled session and writes each
+result as it arrives. The new engine's rate limit is lifted, since the stub does not throttle. Wall time and peak traced
+memory are reported for each.
+
+usage: benchmark_fetch.py [--users 2000] [--latency 0.05] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from requests_futures.sessions import FuturesSession
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from grok_utils.fetcher import Fetcher  # pylint:disable=wrong-import-position
+from grok_utils.ratelimit import RateLimiter  # pylint:disable=wrong-import-position
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stub takes to answer")
+    parser.add_argument("--concurrency", type=int, default=16)
+    return parser.parse_args()
+
+
+def start_stub(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            user = self.path.split("/")[3]
+            body = json.dumps(
+                {
+                    "full_name": f"Student {user}",
+                    "submissions": [{"when": "2021-05-01T10:00:00.000000+1000", "npassed": n} for n in range(20)],
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_result(resp, logfile):
+    o = resp.json()
+    for submission in o["submissions"]:
+        logfile.write(f"{o['full_name']},{submission['when']},{submission['npassed']}\n")
+
+
+def fetch_with_futures(url, users, logfile):
+    session = FuturesSession()
+    futures = []
+    for i, user in enumerate(users):
+        futures.append(session.get(url.format(user=user)))
+        if i % 10 == 0:
+            time.sleep(0.3)
+    for future in concurrent.futures.as_completed(futures):
+        write_result(future.result(), logfile)
+
+
+def fetch_with_asyncio(url, users, concurrency, logfile):
+    with Fetcher(RateLimiter(float("inf"), concurrency), concurrency) as fetcher:
+        asyncio.run(
+            fetcher.for_each(
+                users, lambda user: fetcher.get(url.format(user=user)), lambda _, resp: write_result(resp, logfile)
+            )
+        )
+
+
+def measure(fetch, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with tempfile.TemporaryFile("w") as logfile:
+        fetch(*args, logfile)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    args = parse_args()
+    server = start_stub(args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/api/user/{{user}}/course_module/1/module_problem/1/"
+    users = range(args.users)
+
+    timings = {}
+    console.print(f"Fetching {args.users} users with FuturesSession...")
+    timings["FuturesSession"] = measure(fetch_with_futures, url, users)
+    console.print(f"Fetching {args.users} users with asyncio...")
+    timings[f"asyncio ({args.concurrency} in flight)"] = measure(fetch_with_asyncio, url, users, args.concurrency)
+    server.shutdown()
+
+    baseline = next(iter(timings.values()))[0]
+    table = Table(title=f"Fetching {args.users} users, {args.latency}s per response", header_style="bold magenta")
+    for column in ("Approach", "Seconds", "Users/s", "Peak memory", "Speed-up"):
+        table.add_column(column)
+    for name, (elapsed, peak) in timings.items():
+        table.add_row(
+            name,
+            f"{elapsed:.1f}",
+            f"{args.users / elapsed:.0f}",
+            f"{peak / 1024 ** 2:.1f} MB",
+            f"{baseline / elapsed:.1f}x",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
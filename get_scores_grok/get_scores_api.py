@@ -1,8 +1,20 @@
 #!/usr/bin/env python3
-"""This script uses an undocument Grok API to fetch the maximum number of tests passed by students on a problem that has multiple tests.
+"""This script uses an undocument Grok API to fetch the maximum number of tests passed by students on problems that have multiple tests.
+
+grok_problem_suffix may list several problems, separated by commas, and every user's history on every problem is fetched in one pass.
+The results are written to scores.csv as one row per student (their Grok user id and name) with, for each problem, their best npassed, number of attempts, and when they first
+passed every test and how many hours after their first attempt (see aggregate.py). Every submission is written to submissions.csv. Set
+grok_output_format to parquet to write .parquet files instead.
+
+Fetched submissions are kept in a local store (grok_store, see store.py), so each run adds to what earlier runs fetched. With grok_activity_order set to
+a dashboard ordering that lists the most recently active students first, a run stops fetching once a whole window of students in a row has nothing new,
+so a mid-semester refresh only fetches those who have submitted since the last one.
 
 This script is supplemented by config.py, for which a sample is provided. 
 The user can either supply the session token by extracting it from a Grok session manually, otherwise, if empty, the script will launch a Firefox instance for the user to login, and it will then automatically extract the cookie.
+The session is saved (grok_session_file) and reused by later runs, and by migrate-grok-ed, until Grok stops accepting it.
+Requests are paced by a rate limiter (grok_rate and grok_burst in config.ini) that backs off whenever Grok answers 429 or 503.
+Up to grok_concurrency requests are in flight at once over one pooled connection set, and each result is written as it arrives.
 """
 
 from json import JSONDecodeError
@@ -12,12 +24,9 @@ from cachier import cachier
 import datetime
 import logging
 import os
-import concurrent.futures
-import time
-import selenium.webdriver as webdriver
-import selenium.webdriver.support.ui as ui
-import contextlib
-from requests_futures.sessions import FuturesSession
+import re
+from itertools import product
+import asyncio
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 from rich.logging import RichHandler
@@ -28,20 +37,43 @@ from pathlib import Path
 sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
 from utils import (
     get_truthy_config_option,
+    config,
     logger,
     cache_expiry,
 )  # pylint:disable=wrong-import-position
+from grok_utils.fetcher import Fetcher  # pylint:disable=wrong-import-position
+from grok_utils.ratelimit import RateLimiter  # pylint:disable=wrong-import-position
+from grok_utils.session import DEFAULT_SESSION_FILE, VALIDATE_URL, login  # pylint:disable=wrong-import-position
+from store import SubmissionStore  # pylint:disable=wrong-import-position
+from aggregate import (  # pylint:disable=wrong-import-position
+    cohort_summary,
+    load_fetched,
+    load_submissions,
+    summarise,
+    widen,
+    write_table,
+)
 
 MODULE_CONFIG_SECTION = "GROK"
-OUTPUT_FILENAME = "scores.csv"
+OUTPUT_STEM = "scores"
+HISTORY_STEM = "submissions"
 course_slug = get_truthy_config_option("grok_course_slug", MODULE_CONFIG_SECTION)
-problem_suffix = get_truthy_config_option("grok_problem_suffix", MODULE_CONFIG_SECTION)
-
-
-# TODO: https://stackoverflow.com/questions/24435656/python-requests-futures-slow-not-threading-properly/24440743
+problem_suffixes = [
+    suffix.strip()
+    for suffix in get_truthy_config_option("grok_problem_suffix", MODULE_CONFIG_SECTION).split(",")
+    if suffix.strip()
+]
+rate = config.getfloat(MODULE_CONFIG_SECTION, "grok_rate", fallback=5.0)
+burst = config.getint(MODULE_CONFIG_SECTION, "grok_burst", fallback=10)
+concurrency = config.getint(MODULE_CONFIG_SECTION, "grok_concurrency", fallback=16)
+store_path = config.get(MODULE_CONFIG_SECTION, "grok_store", fallback="grok_scores.db")
+activity_order = config.get(MODULE_CONFIG_SECTION, "grok_activity_order", fallback="")
+output_format = config.get(MODULE_CONFIG_SECTION, "grok_output_format", fallback="csv")
+session_file = config.get(MODULE_CONFIG_SECTION, "grok_session_file", fallback=str(DEFAULT_SESSION_FILE))
+validate_url = config.get(MODULE_CONFIG_SECTION, "grok_validate_url", fallback=VALIDATE_URL)
 
 base_url = "https://groklearning.com/api/"
-user_url = f"{base_url}/tutor-dashboard/{course_slug}/sorted-students/?order_by=full_name&ascending=true"
+user_url = f"{base_url}/tutor-dashboard/{course_slug}/sorted-students/"
 
 
 logger = logging.getLogger(__name__)
@@ -51,17 +83,14 @@ logging.basicConfig(
 )
 
 
-def get_session_token():
-    with contextlib.closing(webdriver.Firefox()) as driver:
-        driver.get("https://groklearning.com/login/")
-        wait = ui.WebDriverWait(driver, 180)  # timeout after 180 seconds
-        wait.until(
-            lambda driver: driver.find_elements_by_class_name("account-header-left")
-        )
-        session_token = driver.get_cookie("grok_session")["value"]
-        get_jar().set("grok_session", session_token, domain=".groklearning.com")
-        logger.info(f"session_token={session_token}")
-        return session_token
+def get_session_token(force_browser=False):
+    return login(
+        get_jar(),
+        validate_url,
+        config.get(MODULE_CONFIG_SECTION, "grok_token", fallback=None),
+        session_file,
+        force_browser=force_browser,
+    )
 
 
 def get_jar():
@@ -74,16 +103,26 @@ get_jar.jar = None
 
 # uncomment to cache the list of users, cache is stored at ~/.cachier
 @cachier(stale_after=cache_expiry)
-def get_users():
-    resp = requests.get(user_url, cookies=get_jar())
+def get_users(order_by="full_name", ascending=True):
+    resp = requests.get(
+        user_url,
+        params={"order_by": order_by, "ascending": str(ascending).lower()},
+        cookies=get_jar(),
+    )
     resp.raise_for_status()
     o = resp.json()
     print(f"Processing {len(o)} users...")
     return o
 
 
-def response_hook(resp, logfile):
-    # parse the json storing the result on the response object and write the result to the log file
+def problem_label(problem_suffix):
+    # the module_problem id names a problem's columns in the score table
+    match = re.search(r"module_problem/(\d+)", problem_suffix)
+    return match.group(1) if match else problem_suffix.strip("/")
+
+
+def response_hook(resp):
+    # parse the json, returning the student's name and the (time, npassed) of each of their submissions
     resp_object = None
     try:
         resp_object = resp.json()
@@ -99,71 +138,112 @@ def response_hook(resp, logfile):
     name = resp_object["full_name"]
     logging.info(f"Processing {name}")
 
-    if "submissions" not in resp_object or not resp_object["submissions"]:
-        logfile.write(
-            f"{name},{datetime.date.today().strftime('%Y-%m-%d %H:%M:%S')},-1\n"
-        )
-        return
-
-    submissions = resp_object["submissions"]
-
-    for submission in submissions:
+    submissions = []
+    for submission in resp_object.get("submissions") or []:
         stime = submission["when"]
         stime = datetime.datetime.strptime(stime, "%Y-%m-%dT%H:%M:%S.%f%z").strftime(
             "%Y-%m-%d %H:%M:%S"
         )
-        logfile.write(f"{name},{stime},{submission['npassed']}\n")
+        submissions.append((stime, submission["npassed"]))
+    return name, submissions
 
 
-def get_submission_history(session, user):
+async def get_submission_history(fetcher, user, problem_suffix):
     problem_url = f"{base_url}/user/{user}/{problem_suffix}"
-    future = session.get(
+    return await fetcher.get(
         problem_url, cookies=get_jar(), headers={"User-agent": "your bot 0.1"}
     )
-    return future
 
 
-def main():
+def fetch_submission_histories(users, store):
+    # every user x problem pair shares the one pool of requests, so each problem does not re-list users or wait on the last
+    limiter = RateLimiter(rate, burst)
+    progress = tqdm(total=len(users) * len(problem_suffixes))
+    # problems still to come back for each user, and whether anything new has come back for them so far
+    outstanding = {}
+    active = {}
+    # students finish in whatever order their requests do, so the streak is counted over them in the dashboard's
+    # order: next_user is the first whose problems have not all come back, and finished holds those after it that have
+    finished = {}
+    next_user = 0
+    quiet_streak = 0
+
+    def jobs():
+        for user in users:
+            # with the most recently active students first, a full window of students with nothing new means everyone
+            # after them has nothing new either
+            if activity_order and quiet_streak >= concurrency:
+                logger.info(f"No new submissions from the last {quiet_streak} students, stopping early")
+                return
+            outstanding[user] = len(problem_suffixes)
+            yield from product([user], problem_suffixes)
+
+    def on_result(job, resp):
+        nonlocal next_user, quiet_streak
+        user, problem_suffix = job
+        parsed = None
+        if isinstance(resp, Exception):
+            logger.error(f"Could not fetch submissions for {user} on {problem_suffix}: {resp}")
+        else:
+            parsed = response_hook(resp)
+        # a failed fetch counts as activity, so that it cannot end the refresh early
+        new = store.record(user, problem_label(problem_suffix), *parsed) if parsed else 1
+        active[user] = active.get(user, False) or new > 0
+        outstanding[user] -= 1
+        if not outstanding[user]:
+            finished[user] = active.pop(user)
+            while next_user < len(users) and users[next_user] in finished:
+                quiet_streak = 0 if finished.pop(users[next_user]) else quiet_streak + 1
+                next_user += 1
+        progress.update()
+        progress.set_postfix_str(limiter.status(), refresh=False)
+
+    with Fetcher(limiter, concurrency) as fetcher, logging_redirect_tqdm():
+        asyncio.run(
+            fetcher.for_each(
+                jobs(),
+                lambda job: get_submission_history(fetcher, *job),
+                on_result,
+            )
+        )
+    progress.close()
 
-    try:
-        os.remove(OUTPUT_FILENAME)
-    except Exception as e:
-        pass
 
-    session = FuturesSession()
+def main():
 
-    session_token = get_truthy_config_option("grok_token", MODULE_CONFIG_SECTION)
-    if not session_token:
-        logger.warning("Session token not found, launching Grok Login")
-        session_token = get_session_token()
-    else:
-        get_jar().set("grok_session", session_token, domain=".groklearning.com")
+    get_session_token()
 
-    futures = []
     users = []
     logger.info("Getting User Details...")
+    # the order of recent activity changes between runs, so it is never read from the cache
+    order = (activity_order, False) if activity_order else ("full_name", True)
+    if not activity_order:
+        logger.info(
+            "grok_activity_order is not set, so every student's history is fetched. Set it to the dashboard ordering "
+            "that lists the most recently active students first to only fetch those with new submissions"
+        )
     try:
-        users = get_users()
+        users = get_users(*order, overwrite_cache=bool(activity_order))
     except requests.exceptions.HTTPError as err:
         if err.response.status_code == 401:
             logger.warning("Session token was invalid, launching Grok Login")
-            session_token = get_session_token()
-            users = get_users()
+            get_session_token(force_browser=True)
+            users = get_users(*order, overwrite_cache=bool(activity_order))
 
     logger.info(
-        "Submitting jobs for user submissions... Warning this may take some time"
+        f"Fetching user submissions on {len(problem_suffixes)} problems at up to {rate} requests/s... Warning this may take some time"
     )
-    with logging_redirect_tqdm():
-        for i, user in tqdm(enumerate(users)):
-            futures.append(get_submission_history(session, user))
-            if i % 10 == 0:
-                time.sleep(0.3)  # add delay to prevent rate limiting by Grok servers
-
-    logger.info("Awaiting responses...")
-    with open(OUTPUT_FILENAME, "w") as f:
-        with logging_redirect_tqdm():
-            for future in tqdm(concurrent.futures.as_completed(futures)):
-                response_hook(future.result(), f)
+    problems = [problem_label(suffix) for suffix in problem_suffixes]
+    with SubmissionStore(store_path) as store:
+        fetch_submission_histories(users, store)
+        submissions = load_submissions(store, problems)
+        summary = summarise(submissions, load_fetched(store, problems))
+
+    scores = widen(summary, problems)
+    output_path = write_table(scores, OUTPUT_STEM, output_format)
+    write_table(submissions, HISTORY_STEM, output_format)
+    logger.info(f"Wrote scores for {len(scores)} students to {output_path}")
+    print(cohort_summary(summary).to_string())
 
 
 main()
\ No newline at end of file
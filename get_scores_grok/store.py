@@ -0,0 +1,58 @@
+"""A local SQLite store of the Grok submissions get_scores_api.py has fetched, keyed by user and problem.
+
+Submissions are only ever added, so a refresh that fetches a student again just fills in what is new, and the score
+table can always be rebuilt from the store without fetching anything.
+"""
+import sqlite3
+import time
+from typing import Iterable, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    user TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetched (
+    user TEXT NOT NULL,
+    problem TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (user, problem)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    user TEXT NOT NULL,
+    problem TEXT NOT NULL,
+    time TEXT NOT NULL,
+    npassed INTEGER NOT NULL,
+    PRIMARY KEY (user, problem, time, npassed)
+);
+"""
+
+
+class SubmissionStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, user, problem: str, name: str, submissions: Iterable[Tuple[str, int]]) -> int:
+        """Stores a freshly fetched history, returning how many of its submissions were not already stored"""
+        user = str(user)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO students VALUES (?, ?)", (user, name))
+            self.db.execute("INSERT OR REPLACE INTO fetched VALUES (?, ?, ?)", (user, problem, time.time()))
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO submissions VALUES (?, ?, ?, ?)",
+                ((user, problem, stime, npassed) for stime, npassed in submissions),
+            )
+            return self.db.total_changes - before
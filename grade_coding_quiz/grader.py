@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """This module is an autograder for Canvas Quizzes that interfaces with the Canvas API.
-It uses Docker as a sandbox, running check50 to process assignments.
+It uses Docker (or a bubblewrap jail on Linux) as a sandbox, running check50 to process assignments.
+All submissions are autograded up front in parallel, with per-job CPU, memory and time limits set in config.ini.
+With autograde_upfront off, each submission is instead autograded when the marker reaches it, and every check's result
+is shown as soon as that check finishes.
+Grading can go student by student, or question by question across the whole cohort (see grading_order in config.ini).
 
 Using it requires config.ini to be modified with an apporpriate Canvas API token and the path to the CS50 style checks to be run. 
 Use rubric.py to configure each individual question. The question IDs are sourced from the Canvas API.
@@ -14,8 +18,8 @@ from rich.syntax import Syntax
 from rich.table import Table
 from rich.panel import Panel
 from rich.console import RenderGroup
-from rich.progress import Progress
 from rich.highlighter import ReprHighlighter
+from rich.markup import escape
 import sys
 import os
 
@@ -28,50 +32,130 @@ from utils import (  # pylint:disable=wrong-import-position
     get_user_info,
     get_users_ids,
     submit_quiz_payload,
-    get_truthy_config_option,
+    config,
     logger,
+    quiz_id,
 )
+from utils.scheduler import (  # pylint:disable=wrong-import-position
+    JobScheduler,
+    default_worker_count,
+)
+from utils.sandbox import CHECK50_STREAM_COMMAND, Sandbox, get_sandbox  # pylint:disable=wrong-import-position
+from journal import GradingJournal  # pylint:disable=wrong-import-position
+from timing import BACKGROUND_STAGES, StageTimer  # pylint:disable=wrong-import-position
+from submitter import SubmissionQueue  # pylint:disable=wrong-import-position
 
-import subprocess
 from pathlib import Path
 import shutil
+from functools import lru_cache
 
 console = Console()
 highlighter = ReprHighlighter()
 
 MODULE_CONFIG_SECTION = "GRADER"
+AUTOGRADING_DIR = Path("./tmp/autograding/")
 
+max_workers = config.getint(MODULE_CONFIG_SECTION, "max_workers", fallback=0)
 
-def run_checks(student_dir: Path):
-    """Calls into the CS50 check50 library with appropriate setup to actually run the automated tests"""
-
-    path_to_checks = get_truthy_config_option("path_to_checks", MODULE_CONFIG_SECTION)
-    path_to_dist = get_truthy_config_option("path_to_dist", MODULE_CONFIG_SECTION)
-
-    command = [
-        "docker",
-        "run",
-        f"--volume={Path(path_to_checks).absolute()}:/opt/check_files",
-        f"--volume={Path(student_dir).absolute()}:/src",
-        f"--volume={Path(path_to_dist).absolute()}:/dist",
-        "--rm",
-        "-ti",
-        "shaananc/check50",
-        "check50",
-        "-o",
-        "json",
-        "--dev",
-        "/opt/check_files",
-    ]
+# run every submission's checks in parallel before grading starts, otherwise run them as the marker reaches each student
+autograde_upfront = config.getboolean(MODULE_CONFIG_SECTION, "autograde_upfront", fallback=True)
 
-    p = subprocess.run(command, capture_output=True, check=False)
-    results = p.stdout.decode("ascii")
-    return json.loads(results)
+journal_path = config.get(MODULE_CONFIG_SECTION, "journal_path", fallback="grading_journal.jsonl")
 
+# "student" grades one whole submission at a time, "question" grades one question across the whole cohort at a time
+grading_order = config.get(MODULE_CONFIG_SECTION, "grading_order", fallback="student")
 
-def run_automated_tests(most_recent_answers):
-    """Runs automated tests over a student submission"""
-    student_dir = Path("./tmp/autograding/")
+# grades are sent to Canvas in the background by this many workers, each retrying a failed request this many times
+submit_workers = config.getint(MODULE_CONFIG_SECTION, "submit_workers", fallback=4)
+submit_retries = config.getint(MODULE_CONFIG_SECTION, "submit_retries", fallback=3)
+
+# per-student breakdown of where the grading session spent its time
+timing_csv = config.get(MODULE_CONFIG_SECTION, "timing_csv", fallback="grading_timings.csv")
+# autograding only runs in the background when it runs up front, otherwise the marker waits on it for each student
+timer = StageTimer(
+    BACKGROUND_STAGES
+    if autograde_upfront or grading_order == "question"
+    else BACKGROUND_STAGES - {"autograder"}
+)
+
+def prompt(text: str) -> str:
+    """input(), timed as the marker's own time"""
+    with timer.stage("human_input"):
+        return input(text)
+
+
+def to_text(html: str) -> str:
+    with timer.stage("html2text"):
+        return html2text.html2text(html)
+
+
+def lookup_user_name(user_id) -> str:
+    with timer.stage("user_lookup", user_id):
+        name = get_user_info(user_id)["name"].encode("utf-8").decode("ascii")
+    timer.names[str(user_id)] = name
+    return name
+
+
+def submit_grades(user_id, quiz_submission_id, payload):
+    with timer.stage("canvas_submit", user_id):
+        submit_quiz_payload(quiz_submission_id, payload)
+
+
+@lru_cache(maxsize=None)
+def get_grader_sandbox() -> Sandbox:
+    return get_sandbox(MODULE_CONFIG_SECTION)
+
+
+def run_checks(student_dir: Path, on_result=None):
+    """Calls into the CS50 check50 library with appropriate setup to actually run the automated tests.
+
+    Returns a dictionary from check name to that check's result. on_result, if given, is called with each result as
+    soon as its check finishes. Checks that had not finished when the sandbox killed the run for taking too long have
+    no result, and interactive_grade tells the marker so.
+    """
+    results = {}
+
+    def on_line(line):
+        try:
+            result = json.loads(line)
+        except ValueError:
+            logger.warning(f"Ignoring unexpected check50 output in {student_dir}: {line!r}")
+            return
+        if "error" in result:
+            logger.error(f"check50 failed in {student_dir}: {result['error'].get('value', result['error'])}")
+            return
+
+        results[result["name"]] = result
+        if on_result:
+            on_result(result)
+
+    sandbox = get_grader_sandbox()
+    if sandbox.run(CHECK50_STREAM_COMMAND, student_dir, on_line=on_line) is None:
+        logger.error(
+            f"check50 in {student_dir} was killed after {sandbox.limits.timeout}s, "
+            f"only {len(results)} check(s) reported a result"
+        )
+    return results
+
+
+def render_check_result(result) -> str:
+    """A line of rich markup summarising one check's result, in check50's :) :( :| style"""
+    description = escape(result["description"] or result["name"])
+    rationale = escape((result.get("cause") or {}).get("rationale") or "")
+    if result["passed"]:
+        return f"[green]:) {description}[/green]"
+    if result["passed"] is None:
+        return f"[yellow]:| {description}[/yellow]\n    {rationale}"
+
+    lines = [f"[red]:( {description}[/red]\n    {rationale}"]
+    # the tail of the log is where compiler errors end up
+    lines += [f"    [dim]{escape(line)}[/dim]" for line in result.get("log", [])[-10:]]
+    return "\n".join(lines)
+
+
+def write_student_files(most_recent_answers, student_dir: Path):
+    """Writes each autograded answer to {question_id}.c, returning whether anything needs testing"""
+    needs_tests = False
     for answer in most_recent_answers:
         question_id = answer["question_id"]
         if (
@@ -84,21 +168,76 @@ def run_automated_tests(most_recent_answers):
             Path(student_dir).mkdir(parents=True, exist_ok=True)
             with open(student_dir.joinpath(f"./{question_id}.c"), "a") as f:
                 f.write("\n")
-                f.write(html2text.html2text(answer["text"]))
+                f.write(to_text(answer["text"]))
+            needs_tests = True
+
+    return needs_tests
 
-    with Progress(expand=True) as progress:
-        task1 = progress.add_task(
-            "[red]Running automated tests...", start=False, transient=True
-        )
-        results = run_checks(student_dir)
-        progress.start_task(task1)
-        progress.update(task1, total=100, completed=100)
+
+def run_automated_tests(most_recent_answers):
+    """Runs automated tests over a student submission"""
+    student_dir = AUTOGRADING_DIR
+    if not write_student_files(most_recent_answers, student_dir):
+        return {}
+
+    finished = 0
+    with console.status("[red]Running automated tests...") as status:
+
+        def show_result(result):
+            nonlocal finished
+            finished += 1
+            console.print(render_check_result(result))
+            status.update(f"[red]Running automated tests... {finished} checks finished")
+
+        results = run_checks(student_dir, on_result=show_result)
 
     shutil.rmtree(student_dir)
 
     return results
 
 
+def run_scheduled_checks(job):
+    """Scheduler job: runs the checks for one prepared submission directory and cleans it up afterwards"""
+    user_id, student_dir = job
+    try:
+        with timer.stage("autograder", user_id):
+            return run_checks(student_dir)
+    finally:
+        shutil.rmtree(student_dir, ignore_errors=True)
+
+
+def autograde_submissions(submissions):
+    """Runs the automated tests for every submission in parallel before grading starts.
+
+    Returns a dictionary from submission id to check50 results.
+    """
+    jobs = {}
+    for submission in submissions:
+        submission_history = sorted(
+            submission["submission_history"], key=lambda x: x["attempt"]
+        )
+        if "submission_data" not in submission_history[0]:
+            continue
+
+        timer.current_user = submission["user_id"]
+        student_dir = AUTOGRADING_DIR / str(submission["id"])
+        if write_student_files(submission_history[0]["submission_data"], student_dir):
+            jobs[submission["id"]] = (submission["user_id"], student_dir)
+
+    limits = get_grader_sandbox().limits
+    workers = max_workers or default_worker_count(limits.cpus, limits.memory)
+    return JobScheduler(run_scheduled_checks, workers).run_all(jobs)
+
+
+def format_resources(test):
+    """The CPU time and peak memory the check measured for each program it ran, or an empty string"""
+    resources = (test.get("data") or {}).get("resources") or {}
+    return ", ".join(
+        f'{label}: {usage["user_seconds"] + usage["sys_seconds"]:.2f}s CPU, {usage["max_rss_kb"] / 1024:.1f} MB'
+        for label, usage in resources.items()
+    )
+
+
 def generate_test_output_panel(test):
     panel_items = []
     if test["passed"] == False and "expected" in test["cause"]:
@@ -111,8 +250,13 @@ def generate_test_output_panel(test):
             f'[green]{test["cause"]["expected"]}[/green]',
         )
         panel_items.append(table)
+        # where the output first diverged, when the check compared it line by line
+        if test["cause"].get("help"):
+            panel_items.append(f'[yellow]{escape(test["cause"]["help"])}[/yellow]\n')
     else:
         panel_items.append("[magenta]Automated Compilation Failed.[/magenta]\n")
+    if format_resources(test):
+        panel_items.append(f"[dim]{format_resources(test)}[/dim]\n")
 
     return panel_items
 
@@ -128,17 +272,25 @@ def interactive_grade(
             if test_name in results:
                 test = results[test_name]
                 if test["passed"]:
+                    resources = format_resources(test)
                     panel_items.append(
-                        f"[green]{test_name} Passed: {pts} points![/green]\n"
+                        f"[green]{test_name} Passed: {pts} points![/green]"
+                        + (f" [dim]({resources})[/dim]" if resources else "")
+                        + "\n"
                     )
                     score_pts += pts
                 else:
                     panel_items += generate_test_output_panel(test)
+            else:
+                # the run timed out or check50 failed before this check reported, so it needs marking by hand
+                panel_items.append(
+                    f"[yellow]{test_name} has no result, the automated tests timed out or did not run[/yellow]\n"
+                )
 
         score_comment = ""
 
         student_code = Syntax(
-            html2text.html2text(student_answer["text"]),
+            to_text(student_answer["text"]),
             "c",
             theme="monokai",
             line_numbers=True,
@@ -151,7 +303,7 @@ def interactive_grade(
 
             console.print(Panel(RenderGroup(*panel_items), title=internal_title))
 
-            score_in = input("{}: ?/{}  ".format(f"Question {idx+1}", full_score))
+            score_in = prompt("{}: ?/{}  ".format(f"Question {idx+1}", full_score))
             score_split = score_in.split(" ")
             score_pts = min(round(float(score_split[0]), 1), full_score)
             score_comment = " ".join(score_split[1:])
@@ -213,7 +365,7 @@ def grade_question(results, student_answer, idx: int) -> tuple[float, str]:
             internal_title,
             idx,
         )
-        comment += input("Question Comments:\n") + "\n\n"
+        comment += prompt("Question Comments:\n") + "\n\n"
 
     grade = min(round(score_pts, 1), full_score)
     comment += "{}: {}/{}".format(f"Question {idx+1}", score_pts, full_score)
@@ -235,16 +387,63 @@ def get_question_score(idx, student_answer, autograder_results):
     return {"score": q_grade, "comment": q_comment}
 
 
-def grade_submission(submission):
-    """Grades an individual user's submission"""
-    console.clear()
-    user = get_user_info(submission["user_id"])["name"].encode("utf-8").decode("ascii")
+def build_payload(attempt, question_grades):
+    return {
+        "quiz_submissions": [
+            {
+                "attempt": attempt,
+                "questions": question_grades,
+            }
+        ]
+    }
+
+
+def replay_journal(journal: GradingJournal, queue: SubmissionQueue):
+    """Queues any grades that were journaled but not accepted by Canvas before the last session ended"""
+    for user_id, entry in journal.pending():
+        logger.info(f"Resubmitting journaled grades for user {user_id}")
+        queue.put(
+            user_id,
+            entry["submission_id"],
+            entry["attempt"],
+            build_payload(entry["attempt"], entry["questions"]),
+        )
+
+
+def show_submission_status(queue: SubmissionQueue):
+    """Tells the marker about grades still on their way to Canvas, and requeues any that failed"""
+    status = queue.status()
+    if status:
+        console.print(status)
+    queue.retry_failed()
+
+
+def grade_submission(
+    submission,
+    results=None,
+    journal: GradingJournal = None,
+    queue: SubmissionQueue = None,
+):
+    """Grades an individual user's submission, running the automated tests unless results are supplied.
+
+    Confirmed grades are handed to queue to be sent in the background if one is given, otherwise they are sent before
+    returning.
+    """
+    timer.current_user = submission["user_id"]
+    user = lookup_user_name(submission["user_id"])
+    with timer.stage("render"):
+        _grade_submission(submission, user, results, journal, queue)
+
 
+def _grade_submission(submission, user, results, journal: GradingJournal, queue: SubmissionQueue):
+    console.clear()
     logger.info(f"Grading User {user}")
     console.print(
         Panel(f"[bold cyan]Grading User {user}[/bold cyan]", expand=False),
         justify="center",
     )
+    if queue:
+        show_submission_status(queue)
 
     submission_history = sorted(
         submission["submission_history"], key=lambda x: x["attempt"]
@@ -254,7 +453,9 @@ def grade_submission(submission):
 
     most_recent_answers = submission_history[0]["submission_data"]
 
-    results = run_automated_tests(most_recent_answers)
+    if results is None:
+        with timer.stage("autograder"):
+            results = run_automated_tests(most_recent_answers)
 
     question_grades = {}
     # Loop until the user confirms that they are happy with the submission
@@ -268,19 +469,25 @@ def grade_submission(submission):
 
         console.print(Panel(highlighter(comment)))
         console.print(f"Grade: {grade}")
-        confirm = input("Correct? [y/N/cancel].")
+        confirm = prompt("Correct? [y/N/cancel].")
 
         if "Y" in confirm or "y" in confirm:
-            payload = {
-                "quiz_submissions": [
-                    {
-                        "attempt": submission_history[0]["attempt"],
-                        "questions": question_grades,
-                    }
-                ]
-            }
-
-            submit_quiz_payload(submission_history[0]["id"], payload)
+            attempt = submission_history[0]["attempt"]
+            quiz_submission_id = submission_history[0]["id"]
+            if journal:
+                journal.record_graded(
+                    submission["user_id"], quiz_submission_id, attempt, question_grades
+                )
+
+            payload = build_payload(attempt, question_grades)
+            if queue:
+                queue.put(submission["user_id"], quiz_submission_id, attempt, payload)
+                return
+
+            submit_grades(submission["user_id"], quiz_submission_id, payload)
+            if journal:
+                journal.record_submitted(submission["user_id"], quiz_submission_id, attempt)
+            return
 
         elif confirm == "" or confirm[0] == "N" or confirm[0] == "n":
             continue
@@ -288,15 +495,156 @@ def grade_submission(submission):
             return
 
 
+def build_answer_index(submissions, autograder_results):
+    """Groups every student's answer by question_id, keeping questions in the order they appear in the quiz"""
+    index = {}
+    for submission in submissions:
+        submission_history = sorted(
+            submission["submission_history"], key=lambda x: x["attempt"]
+        )
+        if "submission_data" not in submission_history[0]:
+            continue
+
+        for idx, answer in enumerate(submission_history[0]["submission_data"]):
+            index.setdefault(answer["question_id"], []).append(
+                {
+                    "user_id": submission["user_id"],
+                    "quiz_submission_id": submission_history[0]["id"],
+                    "attempt": submission_history[0]["attempt"],
+                    "answer": answer,
+                    "idx": idx,
+                    "results": autograder_results.get(submission["id"]) or {},
+                }
+            )
+    return index
+
+
+def grade_by_question(
+    submissions, autograder_results, journal: GradingJournal, queue: SubmissionQueue
+):
+    """Grades one question for every student before moving onto the next.
+
+    Each question grade is journaled as it is given, and each student's grades are sent to Canvas in one request once
+    every question has been graded.
+    """
+    index = build_answer_index(submissions, autograder_results)
+    for question_id, entries in index.items():
+        for n, entry in enumerate(entries):
+            journaled = journal.entry(entry["quiz_submission_id"], entry["attempt"])
+            if str(question_id) in journaled.get("questions", {}):
+                continue
+
+            timer.current_user = entry["user_id"]
+            user = lookup_user_name(entry["user_id"])
+            try:
+                with timer.stage("render"):
+                    console.clear()
+                    console.print(
+                        Panel(
+                            f"[bold cyan]Question {entry['idx']+1}: {user} ({n+1}/{len(entries)})[/bold cyan]",
+                            expand=False,
+                        ),
+                        justify="center",
+                    )
+                    question_grade = get_question_score(
+                        entry["idx"], entry["answer"], entry["results"]
+                    )
+            except KeyboardInterrupt:
+                continue
+
+            journal.record_graded(
+                entry["user_id"],
+                entry["quiz_submission_id"],
+                entry["attempt"],
+                {question_id: question_grade},
+                complete=False,
+            )
+
+    # the questions each student has an answer to, all of which must be graded before their grades are sent
+    needed = {}
+    for question_id, entries in index.items():
+        for entry in entries:
+            needed.setdefault(entry["user_id"], (entry, set()))[1].add(str(question_id))
+    for user_id, (entry, question_ids) in needed.items():
+        journaled = journal.entry(entry["quiz_submission_id"], entry["attempt"])
+        if not journaled or journaled["submitted"] or journaled["complete"]:
+            continue
+        missing = question_ids - set(journaled["questions"])
+        if missing:
+            # skipped with Ctrl-C, so left incomplete and asked again on the next run
+            logger.warning(f"Not submitting grades for user {user_id}, {len(missing)} question(s) still to grade")
+            continue
+        journal.record_graded(
+            user_id, entry["quiz_submission_id"], entry["attempt"], {}, complete=True
+        )
+        # only the students completed just now, main has already replayed what earlier sessions left pending
+        queue.put(
+            user_id,
+            entry["quiz_submission_id"],
+            entry["attempt"],
+            build_payload(entry["attempt"], journaled["questions"]),
+        )
+
+
 def main():
     logger.info("Downloading User Data...")
     get_users_ids()
     logger.info("Fetching Quiz Answers...")
     quiz = get_quiz_info()
     quiz_assignment_id = quiz["assignment_id"]
-    for submission in get_quiz_submission_history(quiz_assignment_id):
+
+    journal = GradingJournal(journal_path, quiz_id)
+    queue = SubmissionQueue(
+        submit_grades, journal, max_workers=submit_workers, retries=submit_retries
+    )
+    replay_journal(journal, queue)
+
+    try:
+        grade_quiz(quiz_assignment_id, journal, queue)
+    finally:
+        logger.info("Waiting for grades to finish sending to Canvas...")
+        queue.drain()
+        console.print(timer.report())
+        timer.write_csv(timing_csv)
+        logger.info(f"Wrote grading timings to {timing_csv}")
+
+
+def graded_attempt(submission):
+    """The (quiz_submission_id, attempt) of the attempt grading works on, which is the first in the history"""
+    submission_history = sorted(
+        submission["submission_history"], key=lambda x: x["attempt"]
+    )
+    return submission_history[0]["id"], submission_history[0]["attempt"]
+
+
+def grade_quiz(quiz_assignment_id, journal: GradingJournal, queue: SubmissionQueue):
+    submissions = [
+        submission
+        for submission in timer.timed_iter(
+            get_quiz_submission_history(quiz_assignment_id),
+            "canvas_fetch",
+            key=lambda submission: submission["user_id"],
+        )
+        # a new attempt, or the same student in another quiz, is a different journal entry and is graded afresh.
+        # attempts graded in an earlier session but not yet accepted by Canvas are left to replay_journal
+        if not journal.is_graded(*graded_attempt(submission))
+    ]
+    logger.info(f"{len(submissions)} submissions left to grade")
+    if autograde_upfront or grading_order == "question":
+        logger.info("Running Automated Tests...")
+        autograder_results = autograde_submissions(submissions)
+    else:
+        # grade_submission runs each student's checks when it reaches them
+        autograder_results = None
+
+    if grading_order == "question":
+        grade_by_question(submissions, autograder_results, journal, queue)
+        return
+
+    for submission in submissions:
         try:
-            grade_submission(submission)
+            results = None if autograder_results is None else autograder_results.get(submission["id"]) or {}
+            grade_submission(submission, results, journal, queue)
         except KeyboardInterrupt:
             continue
         except Exception as e:
@@ -0,0 +1,127 @@
+"""Append-only journal of grading decisions, so that an interrupted grading session can resume where it left off.
+
+Each line is a JSON record. A "graded" record stores the question scores and comments for a student before they are
+sent to Canvas, and a "submitted" record is appended once Canvas has accepted them. Records are flushed and fsynced as
+they are written, so at most the line being written during a crash is lost, and such a line is ignored on load.
+
+Entries are keyed by quiz, quiz submission and attempt rather than by student, so one journal can be shared between
+quizzes, and a student's new attempt is graded afresh rather than skipped because an earlier one was submitted.
+"""
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from utils import logger  # pylint:disable=wrong-import-position
+
+
+def journal_key(quiz_id, submission_id, attempt) -> str:
+    # ids are compared as strings, as that is how they come back out of JSON
+    return f"{quiz_id}/{submission_id}/{attempt}"
+
+
+class GradingJournal:
+    def __init__(self, path, quiz_id):
+        """quiz_id is the quiz being graded, which every record is tagged with and every lookup is limited to"""
+        self.path = Path(path)
+        self.quiz_id = quiz_id
+        # keyed by journal_key(quiz_id, submission_id, attempt)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+
+        line = ""
+        with open(self.path) as f:
+            for line_no, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring corrupt line {line_no} of {self.path}")
+                    continue
+                self._apply(record)
+
+        # terminate a line cut short by a crash so the next record starts on a line of its own
+        if line and not line.endswith("\n"):
+            with open(self.path, "a") as f:
+                f.write("\n")
+
+        logger.info(f"Loaded grading journal with {len(self.entries)} submissions from {self.path}")
+
+    def _apply(self, record):
+        entry = self.entries.setdefault(
+            journal_key(record.get("quiz_id"), record["submission_id"], record["attempt"]),
+            {"questions": {}, "complete": False, "submitted": False},
+        )
+        entry["quiz_id"] = record.get("quiz_id")
+        entry["user_id"] = record["user_id"]
+        entry["submission_id"] = record["submission_id"]
+        entry["attempt"] = record["attempt"]
+        if record["event"] == "graded":
+            entry["questions"].update(
+                {str(question_id): grade for question_id, grade in record["questions"].items()}
+            )
+            entry["complete"] = entry["complete"] or record["complete"]
+        elif record["event"] == "submitted":
+            entry["submitted"] = True
+
+    def _append(self, record):
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def record_graded(self, user_id, submission_id, attempt, questions, complete=True):
+        """Journals question grades for a student. Incomplete records hold grades for only some of the questions"""
+        self._append(
+            {
+                "event": "graded",
+                "quiz_id": self.quiz_id,
+                "user_id": user_id,
+                "submission_id": submission_id,
+                "attempt": attempt,
+                "questions": questions,
+                "complete": complete,
+            }
+        )
+
+    def record_submitted(self, user_id, submission_id, attempt):
+        """Journals that Canvas has accepted the grades for a student"""
+        self._append(
+            {
+                "event": "submitted",
+                "quiz_id": self.quiz_id,
+                "user_id": user_id,
+                "submission_id": submission_id,
+                "attempt": attempt,
+            }
+        )
+
+    def entry(self, submission_id, attempt) -> Dict[str, Any]:
+        """The journaled grades for an attempt at this quiz, empty if there are none"""
+        return self.entries.get(journal_key(self.quiz_id, submission_id, attempt), {})
+
+    def is_submitted(self, submission_id, attempt) -> bool:
+        return self.entry(submission_id, attempt).get("submitted", False)
+
+    def is_graded(self, submission_id, attempt) -> bool:
+        """Whether every question of an attempt has been graded, whether or not Canvas has accepted the grades yet"""
+        entry = self.entry(submission_id, attempt)
+        return entry.get("complete", False) or entry.get("submitted", False)
+
+    def pending(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        """(user_id, entry) for attempts at this quiz whose grades are complete locally but were never accepted by
+        Canvas. Grades for other quizzes are left alone, as they can only be sent to their own quiz's submissions."""
+        return [
+            (entry["user_id"], entry)
+            for entry in self.entries.values()
+            if str(entry["quiz_id"]) == str(self.quiz_id) and entry["complete"] and not entry["submitted"]
+        ]
@@ -0,0 +1,101 @@
+"""Sends confirmed grades to Canvas in the background, so that the marker never waits on the network between students.
+
+Grades are journaled before they are queued, and only journaled as submitted once Canvas accepts them, so anything
+still queued or failed when the grader exits is replayed on the next run.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from utils import logger  # pylint:disable=wrong-import-position
+from journal import GradingJournal  # pylint:disable=wrong-import-position
+
+
+class SubmissionQueue:
+    def __init__(
+        self,
+        submit: Callable,
+        journal: GradingJournal,
+        max_workers: int = 4,
+        retries: int = 3,
+        backoff: float = 2.0,
+    ):
+        """submit(user_id, quiz_submission_id, payload) sends one student's grades, raising if Canvas rejects them"""
+        self.submit = submit
+        self.journal = journal
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="submit")
+        self._lock = threading.Lock()
+        self._futures = set()
+        # user_id -> (quiz_submission_id, attempt, payload, error) for grades that ran out of retries
+        self.failed: Dict = {}
+
+    def put(self, user_id, quiz_submission_id, attempt, payload):
+        with self._lock:
+            self.failed.pop(user_id, None)
+            future = self._executor.submit(
+                self._send, user_id, quiz_submission_id, attempt, payload
+            )
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _send(self, user_id, quiz_submission_id, attempt, payload):
+        for attempt_no in range(1, self.retries + 1):
+            try:
+                self.submit(user_id, quiz_submission_id, payload)
+            except requests.exceptions.RequestException as e:
+                logger.warning(
+                    f"Submitting grades for user {user_id} failed ({attempt_no}/{self.retries}): {e}"
+                )
+                if attempt_no == self.retries:
+                    with self._lock:
+                        self.failed[user_id] = (quiz_submission_id, attempt, payload, e)
+                    return
+                time.sleep(self.backoff**attempt_no)
+            else:
+                self.journal.record_submitted(user_id, quiz_submission_id, attempt)
+                return
+
+    def retry_failed(self):
+        """Queues every grade that ran out of retries for another round"""
+        with self._lock:
+            failed, self.failed = self.failed, {}
+        for user_id, (quiz_submission_id, attempt, payload, _) in failed.items():
+            self.put(user_id, quiz_submission_id, attempt, payload)
+
+    def status(self) -> Optional[str]:
+        """A line of rich markup describing grades still sending or failed, or None if everything has been sent"""
+        with self._lock:
+            sending, failed = len(self._futures), len(self.failed)
+        parts = []
+        if sending:
+            parts.append(f"[yellow]{sending} grades sending to Canvas[/yellow]")
+        if failed:
+            parts.append(f"[red]{failed} grades failed to send, retrying[/red]")
+        return ", ".join(parts) or None
+
+    def drain(self, rounds: int = 2):
+        """Waits for every queued grade to be sent, retrying failures up to rounds more times"""
+        for round_no in range(rounds + 1):
+            with self._lock:
+                futures = set(self._futures)
+            wait(futures)
+            if not self.failed or round_no == rounds:
+                break
+            self.retry_failed()
+
+        self._executor.shutdown(wait=True)
+        for user_id, (_, _, _, error) in self.failed.items():
+            logger.error(f"Grades for user {user_id} were not accepted by Canvas ({error}), they will be resent next run")
@@ -0,0 +1,125 @@
+"""Records how long each stage of grading takes for every student, to show where a grading session spends its time.
+
+Stages nest, and each stage is charged only for its own time: a "render" stage that waits on an inner "human_input"
+stage is not also charged for the wait. Stages can be timed from worker threads, each thread keeps its own nesting.
+"""
+import csv
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from rich.table import Table
+
+STAGES = [
+    "canvas_fetch",
+    "user_lookup",
+    "html2text",
+    "autograder",
+    "render",
+    "human_input",
+    "canvas_submit",
+]
+
+# stages that happen up front or in the background, rather than while the marker works through a student
+BACKGROUND_STAGES = frozenset({"canvas_fetch", "autograder", "canvas_submit"})
+
+
+class StageTimer:
+    def __init__(self, background_stages=BACKGROUND_STAGES):
+        """background_stages are left out of the marker's time per student, so should only hold the stages that
+        really do not keep the marker waiting in this session"""
+        self.background_stages = frozenset(background_stages)
+        self.seconds = defaultdict(lambda: defaultdict(float))
+        # keyed by str(user_id), like the timings
+        self.names = {}
+        # the student that stages are charged to when no user is given
+        self.current_user = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def record(self, stage, seconds, user=None):
+        user = self.current_user if user is None else user
+        # ids arrive both as ints from Canvas and as strings from the journal
+        user = None if user is None else str(user)
+        with self._lock:
+            self.seconds[user][stage] += seconds
+
+    @contextmanager
+    def stage(self, stage, user=None):
+        """Times the body of the with statement, less the time spent in any stages nested inside it"""
+        stack = self._stack()
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.record(stage, elapsed - nested, user)
+
+    def timed_iter(self, iterable, stage, key):
+        """Yields from iterable, charging the time taken to produce each item to the user key(item) returns"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - start, key(item))
+            yield item
+
+    def interactive_seconds(self, user) -> float:
+        return sum(s for stage, s in self.seconds[user].items() if stage not in self.background_stages)
+
+    def graded_users(self):
+        return [user for user, stages in self.seconds.items() if user is not None and "render" in stages]
+
+    def report(self) -> Table:
+        """A table of the time spent in each stage across the session, with the marking rate"""
+        users = self.graded_users()
+        table = Table(title="Grading Session Timings", header_style="bold magenta", show_footer=True)
+        table.add_column("Stage", footer="Students per hour")
+        table.add_column("Total (s)")
+        table.add_column("Mean per student (s)")
+        table.add_column("Share")
+
+        totals = {stage: sum(self.seconds[user][stage] for user in self.seconds) for stage in STAGES}
+        session_total = sum(totals.values()) or 1.0
+        for stage in STAGES:
+            table.add_row(
+                stage,
+                f"{totals[stage]:.1f}",
+                f"{totals[stage] / len(users):.2f}" if users else "-",
+                f"{100 * totals[stage] / session_total:.0f}%",
+            )
+
+        interactive_hours = sum(self.interactive_seconds(user) for user in users) / 3600
+        rate = len(users) / interactive_hours if interactive_hours else 0.0
+        table.columns[1].footer = f"{rate:.1f}"
+        return table
+
+    def write_csv(self, path):
+        """Writes one row per student with the seconds spent in each stage"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user_id", "name", *STAGES, "interactive_total"])
+            for user, stages in self.seconds.items():
+                if user is None:
+                    continue
+                writer.writerow(
+                    [
+                        user,
+                        self.names.get(user, ""),
+                        *(f"{stages[stage]:.3f}" for stage in STAGES),
+                        f"{self.interactive_seconds(user):.3f}",
+                    ]
+                )
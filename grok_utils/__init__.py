@@ -0,0 +1,4 @@
+"""Helpers shared by the scripts that talk to Grok Learning (get_scores_grok and migrate-grok-ed).
+
+Unlike utils, importing these needs no config.ini, since migrate-grok-ed reads its own configuration files.
+"""
@@ -0,0 +1,93 @@
+"""Fetches many Grok URLs concurrently from asyncio, handing each response on as soon as it arrives.
+
+All requests share one requests.Session, whose connection pool holds as many connections as there are requests in
+flight, so connections are kept alive and reused rather than opened per request. requests blocks, so each request runs
+on a thread of an executor of the same size, while asyncio decides what runs when. At most `concurrency` items are in
+flight at once, and items are only taken from their iterable as slots free up, so memory stays flat however many
+there are. Every request is paced by a RateLimiter and retried while Grok throttles it.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from grok_utils.ratelimit import RateLimiter
+
+DEFAULT_CONCURRENCY = 16
+# attempts at a request that Grok keeps throttling before handing on the throttled response
+MAX_ATTEMPTS = 5
+
+_DONE = object()
+
+
+def pooled_session(concurrency: int = DEFAULT_CONCURRENCY) -> requests.Session:
+    """A session that keeps up to concurrency connections to each host alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Fetcher:
+    """Sends GET requests through one pooled session, on an executor sized to the concurrency"""
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        session: Optional[requests.Session] = None,
+    ):
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.session = session or pooled_session(concurrency)
+        self._executor = ThreadPoolExecutor(concurrency)
+
+    def close(self):
+        self._executor.shutdown()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def get(self, url: str, **kwargs) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        for _ in range(MAX_ATTEMPTS):
+            await self.limiter.acquire_async()
+            resp = await loop.run_in_executor(self._executor, lambda: self.session.get(url, **kwargs))
+            if not self.limiter.on_response(resp.status_code, resp.headers.get("Retry-After")):
+                break
+        return resp
+
+    async def for_each(
+        self,
+        items: Iterable,
+        fetch_one: Callable[[Any], Awaitable],
+        on_result: Callable[[Any, Any], None],
+    ):
+        """Awaits fetch_one(item) for every item, at most concurrency at a time, calling on_result(item, result) in
+        the order they complete. An exception from fetch_one is passed to on_result as the result."""
+        items = iter(items)
+        pending = {}
+
+        def start_next() -> bool:
+            item = next(items, _DONE)
+            if item is _DONE:
+                return False
+            pending[asyncio.ensure_future(fetch_one(item))] = item
+            return True
+
+        while len(pending) < self.concurrency and start_next():
+            pass
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                on_result(item, task.exception() or task.result())
+                start_next()
+
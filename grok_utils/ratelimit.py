@@ -0,0 +1,121 @@
+"""A token bucket rate limiter that slows down when Grok pushes back, and speeds up again once it stops.
+
+Every request takes a token first. Tokens refill at `rate` per second up to `burst`, so an idle server is hit with a
+burst straight away and then at a steady rate. A 429 or 503 halves the rate (at most once a second, since the requests
+already in flight will see the same response) and honours any Retry-After by sending nothing until it has passed. After
+every `recovery_seconds` without being throttled the rate grows by a quarter, back up to the configured maximum.
+
+The limiter is shared between threads (acquire) and coroutines (acquire_async) alike.
+"""
+import asyncio
+import email.utils
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+THROTTLED_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, which is either a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Paces requests to at most `rate` per second with bursts of up to `burst`, adapting the rate to throttling"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        min_rate: float = 0.2,
+        recovery_seconds: float = 5.0,
+        window_seconds: float = 5.0,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate)
+        self.recovery_seconds = recovery_seconds
+        self.window_seconds = window_seconds
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        # when the tokens were last counted, in the future while sending is paused for a Retry-After
+        self._updated = time.monotonic()
+        # when the rate last changed, so that one burst of 429s only halves it once, and when it was last throttled
+        self._last_change = self._last_throttled = float("-inf")
+        self._sent = deque()
+
+    def _forget(self, now: float):
+        while self._sent and self._sent[0] < now - self.window_seconds:
+            self._sent.popleft()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """Takes a token, returning how many seconds to wait before sending the request it pays for"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            # a token that has not refilled yet is borrowed, and the request waits until it would have
+            delay = max(0.0, self._updated - now) + max(0.0, -self._tokens) / self.rate
+            self._forget(now)
+            self._sent.append(now + delay)
+            return delay
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    async def acquire_async(self):
+        await asyncio.sleep(self.reserve())
+
+    def on_response(self, status: int, retry_after: Optional[str] = None) -> bool:
+        """Adjusts the rate to a response's status, returning whether the request was throttled and should be retried"""
+        with self._lock:
+            now = time.monotonic()
+            if status not in THROTTLED_STATUSES:
+                quiet = now - max(self._last_change, self._last_throttled)
+                if self.rate < self.max_rate and quiet >= self.recovery_seconds:
+                    self.rate = min(self.max_rate, self.rate * 1.25)
+                    self._last_change = now
+                return False
+
+            self.throttled += 1
+            self._last_throttled = now
+            if now - self._last_change >= 1.0:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_change = now
+            wait = parse_retry_after(retry_after)
+            if wait:
+                self._refill(now)
+                # no burst once the pause is over, only the (reduced) steady rate
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = max(self._updated, now + wait)
+            return True
+
+    def effective_rate(self) -> float:
+        """Requests per second actually sent over the last window_seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._forget(now)
+            return sum(sent <= now for sent in self._sent) / self.window_seconds
+
+    def status(self) -> str:
+        """A short summary for a progress bar's postfix"""
+        return f"{self.effective_rate():.1f} req/s (limit {self.rate:.1f}, throttled {self.throttled})"
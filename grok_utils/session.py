@@ -0,0 +1,123 @@
+"""Reuses a Grok login between runs, so that Firefox is only launched when there is no valid session to reuse.
+
+The grok_session cookie is kept in a file readable only by its owner (DEFAULT_SESSION_FILE unless a script configures
+another), along with when the cookie expires. At startup a token from config.ini is tried first, then the stored one
+unless it has expired, each checked with a single request for the logged in user's account page (VALIDATE_URL), which
+needs the login but is small and cheap for Grok to serve, and whose body is not even read. Only when neither works is
+Firefox launched for the user to log in, and the cookie it ends up with is stored for the next run.
+"""
+import contextlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = "grok_session"
+COOKIE_DOMAIN = ".groklearning.com"
+LOGIN_URL = "https://groklearning.com/login/"
+# answers 200 only when logged in, redirecting to the login page otherwise
+VALIDATE_URL = "https://groklearning.com/account/"
+DEFAULT_SESSION_FILE = Path.home() / ".config" / "unimelb-teaching-tools" / "grok_session.json"
+# seconds to wait for the user to finish logging in
+LOGIN_TIMEOUT = 180
+
+
+def load_session(path: Path) -> Optional[dict]:
+    """The stored session, or None if there is none or it has expired"""
+    try:
+        if path.stat().st_mode & 0o077:
+            # written by something other than save_session, do not trust or keep sharing it
+            logger.warning(f"{path} is readable by other users, restricting it to its owner")
+            path.chmod(0o600)
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get("expires") and stored["expires"] <= time.time():
+        logger.info("Stored Grok session has expired")
+        return None
+    return stored
+
+
+def save_session(path: Path, token: str, expires: Optional[float] = None):
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # created with owner-only permissions, so the token is never readable by anyone else, even briefly
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"token": token, "expires": expires, "saved_at": time.time()}, f)
+
+
+def is_valid(token: str, validate_url: str = VALIDATE_URL) -> bool:
+    """Whether token is logged in, judged by one request that Grok refuses or redirects to the login page if not"""
+    try:
+        # only the status is needed, so the connection is closed without downloading the page
+        with requests.get(
+            validate_url,
+            cookies={COOKIE_NAME: token},
+            headers={"User-agent": "your bot 0.1"},
+            allow_redirects=False,
+            timeout=30,
+            stream=True,
+        ) as resp:
+            return resp.status_code == 200
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not check the Grok session: {e}")
+        return False
+
+
+def browser_login(firefox_path: Optional[str] = None) -> Tuple[str, Optional[float]]:
+    """Launches Firefox for the user to log in, returning the session cookie and when it expires"""
+    # selenium is only needed when there is no session to reuse
+    import selenium.webdriver as webdriver
+    import selenium.webdriver.support.ui as ui
+
+    options = webdriver.FirefoxOptions()
+    if firefox_path:
+        options.binary_location = firefox_path
+    with contextlib.closing(webdriver.Firefox(options=options)) as driver:
+        driver.get(LOGIN_URL)
+        ui.WebDriverWait(driver, LOGIN_TIMEOUT).until(
+            lambda driver: driver.find_elements("class name", "account-header-left")
+        )
+        cookie = driver.get_cookie(COOKIE_NAME)
+    if not cookie:
+        raise RuntimeError(f"Could not find the {COOKIE_NAME} cookie after logging in")
+    return cookie["value"], cookie.get("expiry")
+
+
+def login(
+    jar: requests.cookies.RequestsCookieJar,
+    validate_url: str = VALIDATE_URL,
+    token: Optional[str] = None,
+    session_file: Path = DEFAULT_SESSION_FILE,
+    firefox_path: Optional[str] = None,
+    force_browser: bool = False,
+) -> str:
+    """Sets a valid grok_session cookie in jar, returning the token.
+
+    token (e.g. from config.ini) is tried first, then the stored session, then the browser. force_browser skips
+    straight to the browser, for when Grok has just rejected the session in use.
+    """
+    session_file = Path(session_file).expanduser()
+    if not force_browser:
+        stored = load_session(session_file)
+        candidates = [(token, None), (stored and stored["token"], stored and stored.get("expires"))]
+        for candidate, expires in candidates:
+            if candidate and is_valid(candidate, validate_url):
+                if stored is None or candidate != stored["token"]:
+                    save_session(session_file, candidate, expires)
+                jar.set(COOKIE_NAME, candidate, domain=COOKIE_DOMAIN)
+                return candidate
+        logger.warning("No valid Grok session found, launching Grok Login")
+
+    token, expires = browser_login(firefox_path)
+    save_session(session_file, token, expires)
+    jar.set(COOKIE_NAME, token, domain=COOKIE_DOMAIN)
+    logger.info(f"Logged in to Grok, session saved to {session_file}")
+    return token
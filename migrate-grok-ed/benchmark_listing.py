@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Compares how scrape_grok.py used to walk Grok's admin listings with the walk in listing.py.
+
+First every listing page given (saved from the browser, e.g. https://groklearning.com/admin/author-problems/?q=<slug>)
+is parsed --repeat times by each parser, checking that they find the same IDs and links. Without saved pages, --pages
+synthetic pages of --rows problems each are used, laid out like Grok's (a table of links and a Bootstrap pagination).
+
+Then the synthetic listing is served by a local stub that answers every request after --latency seconds, and walked
+both ways: the old loop, which follows the "next" link one page at a time and parses each with html.parser, and
+walk_listing, which reads the page count from the first page and fetches the rest --concurrency at a time. The new
+walk's rate limit is lifted, since the stub does not throttle.
+
+usage: benchmark_listing.py [saved_page.html ...] [--pages 40] [--rows 50] [--latency 0.2] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import bs4
+import requests
+from rich.console import Console
+from rich.table import Table
+
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from grok_utils.fetcher import Fetcher  # pylint:disable=wrong-import-position
+from grok_utils.ratelimit import RateLimiter  # pylint:disable=wrong-import-position
+from listing import PARSERS, parse_listing, walk_listing  # pylint:disable=wrong-import-position
+
+console = Console()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("saved_pages", nargs="*", type=Path, help="listing pages saved from Grok")
+    parser.add_argument("--pages", type=int, default=40, help="pages in the synthetic listing")
+    parser.add_argument("--rows", type=int, default=50, help="problems per synthetic page")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds the stub takes to answer")
+    parser.add_argument("--repeat", type=int, default=20, help="times each page is parsed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    return parser.parse_args()
+
+
+def synthetic_page(number: int, pages: int, rows: int) -> str:
+    """Page number (from 1) of a listing of pages pages, each linking to rows problems"""
+    table_rows = "".join(
+        f'<tr><td><a href="/admin/author-problems/{number * rows + i}/">Exercise {number}.{i}</a></td>'
+        f"<td>unimelb-comp10001</td><td>Published</td></tr>"
+        for i in range(rows)
+    )
+    page_items = "".join(
+        f'<li class="{"active" if n == number else ""}"><a href="?page={n}&amp;q=unimelb">{n}</a></li>'
+        for n in range(1, pages + 1)
+    )
+    next_href = f"?page={number + 1}&amp;q=unimelb" if number < pages else "#"
+    return (
+        "<!DOCTYPE html><html><head><title>Problems</title></head><body>"
+        f"<div class='container'><table class='table'><thead><tr><th>Title</th><th>Course</th><th>State</th></tr>"
+        f"</thead><tbody>{table_rows}</tbody></table>"
+        f'<nav><ul class="pagination">{page_items}<li><a href="{next_href}">&raquo;</a></li></ul></nav>'
+        "</div></body></html>"
+    )
+
+
+def start_stub(pages: int, rows: int, latency: float) -> ThreadingHTTPServer:
+    bodies = {n: synthetic_page(n, pages, rows).encode() for n in range(1, pages + 1)}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = bodies[int(parse_qs(urlparse(self.path).query).get("page", ["1"])[0])]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark_parsers(pages, repeat: int) -> Table:
+    table = Table(title=f"Parsing {len(pages)} listing pages x {repeat}", header_style="bold magenta")
+    for column in ("Parser", "ms per page", "Speed-up"):
+        table.add_column(column)
+    expected = [parse_listing(page, "html.parser") for page in pages]
+    timings = {}
+    for parser in reversed(PARSERS):
+        if [parse_listing(page, parser) for page in pages] != expected:
+            raise AssertionError(f"{parser} does not find the same links as html.parser")
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page in pages:
+                parse_listing(page, parser)
+        timings[parser] = (time.perf_counter() - start) / (repeat * len(pages))
+    baseline = timings["html.parser"]
+    for parser, seconds in timings.items():
+        table.add_row(parser, f"{seconds * 1000:.2f}", f"{baseline / seconds:.1f}x")
+    return table
+
+
+def walk_sequentially(first_url: str, base_url: str):
+    """The loop get_problems used: fetch a page, parse it with html.parser, follow its next link"""
+    search_url = first_url
+    hrefs = []
+    while True:
+        response = requests.get(search_url, headers={"User-agent": "your bot 0.1"})
+        response.raise_for_status()
+        soup = bs4.BeautifulSoup(response.text, "html.parser")
+        links = soup.select("tbody > tr > td > a")
+        hrefs += [str(link.get("href")).split("/")[-2] for link in links]
+        next_page_links = soup.select("nav > ul > li.active + li > a")
+        if not next_page_links or next_page_links[0].get("href") == "#":
+            break
+        search_url = f"{base_url}{next_page_links[0].get('href')}"
+    return hrefs
+
+
+def walk_concurrently(first_url: str, base_url: str, concurrency: int):
+    async def walk(fetcher):
+        return await walk_listing(fetcher, first_url, base_url, headers={"User-agent": "your bot 0.1"})
+
+    with Fetcher(RateLimiter(float("inf"), concurrency), concurrency) as fetcher:
+        return asyncio.run(walk(fetcher))
+
+
+def benchmark_walks(args) -> Table:
+    server = start_stub(args.pages, args.rows, args.latency)
+    base_url = f"http://127.0.0.1:{server.server_port}/admin/author-problems/"
+    first_url = f"{base_url}?q=unimelb"
+
+    timings = {}
+    results = {}
+    console.print(f"Walking {args.pages} pages by following next links...")
+    start = time.perf_counter()
+    results["sequential, html.parser"] = walk_sequentially(first_url, base_url)
+    timings["sequential, html.parser"] = time.perf_counter() - start
+    name = f"concurrent ({args.concurrency} in flight), {PARSERS[0]}"
+    console.print(f"Walking {args.pages} pages with walk_listing...")
+    start = time.perf_counter()
+    results[name] = walk_concurrently(first_url, base_url, args.concurrency)
+    timings[name] = time.perf_counter() - start
+    server.shutdown()
+
+    if len({tuple(ids) for ids in results.values()}) != 1:
+        raise AssertionError("the walks found different IDs")
+    baseline = timings["sequential, html.parser"]
+    table = Table(
+        title=f"Walking {args.pages} pages of {args.rows}, {args.latency}s per response", header_style="bold magenta"
+    )
+    for column in ("Approach", "Seconds", "IDs", "Speed-up"):
+        table.add_column(column)
+    for name, elapsed in timings.items():
+        table.add_row(name, f"{elapsed:.2f}", str(len(results[name])), f"{baseline / elapsed:.1f}x")
+    return table
+
+
+def main():
+    args = parse_args()
+    if len(PARSERS) == 1:
+        console.print("[yellow]lxml or cssselect is not installed, only html.parser can be measured[/yellow]")
+    if args.saved_pages:
+        pages = [path.read_text() for path in args.saved_pages]
+    else:
+        pages = [synthetic_page(n, args.pages, args.rows) for n in range(1, args.pages + 1)]
+    console.print(benchmark_parsers(pages, args.repeat))
+    console.print(benchmark_walks(args))
+
+
+if __name__ == "__main__":
+    main()
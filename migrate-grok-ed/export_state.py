@@ -0,0 +1,117 @@
+"""
+Records the version of every problem and module scrape_grok.py has exported, so a re-run only saves and converts what
+has changed on Grok since.
+
+A version is the export's updated_at, the SHA-256 of its body, and the ETag and Last-Modified headers it was served
+with. When the server gave either header, the next request for the item is conditional, and a 304 means it is
+unchanged without sending the body again. Otherwise the body is still fetched, but an item whose updated_at and hash
+both match is not saved or converted again.
+
+Classes:
+    - ExportState(path: Path):
+        The versions recorded in the JSON file at path.
+"""
+import hashlib
+import json
+import threading
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+
+from resources import write_atomically
+
+
+def find_updated_at(data: Any) -> Optional[Any]:
+    """
+    The updated_at of an export, which is at the top level for problems and inside the single wrapping object for
+    modules ({"module": {...}}).
+    """
+    if not isinstance(data, dict):
+        return None
+    if "updated_at" in data:
+        return data["updated_at"]
+    if len(data) == 1:
+        return find_updated_at(next(iter(data.values())))
+    return None
+
+
+def version_of(response: requests.Response) -> Dict[str, Any]:
+    """
+    The version of a fetched export.
+
+    Args:
+        response (requests.Response): The export's 200 response.
+
+    Returns:
+        dict: Its updated_at, sha256, etag and last_modified, the last two None if the server did not send them.
+    """
+    try:
+        updated_at = find_updated_at(response.json())
+    except (JSONDecodeError, ValueError):
+        updated_at = None
+    return {
+        "updated_at": updated_at,
+        "sha256": hashlib.sha256(response.content).hexdigest(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+class ExportState:
+    """
+    The version each item was last exported at, by kind ("problem" or "module") and ID. Safe to update from several
+    threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.versions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        if self.path.exists():
+            self.versions = json.loads(self.path.read_text())
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, item: str) -> Optional[Dict[str, Any]]:
+        return self.versions.get(kind, {}).get(str(item))
+
+    def request_headers(self, kind: str, item: str) -> Dict[str, str]:
+        """The headers that make a request for item conditional on it having changed, if the server supports it"""
+        stored = self.get(kind, item) or {}
+        headers = {}
+        if stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored.get("last_modified"):
+            headers["If-Modified-Since"] = stored["last_modified"]
+        return headers
+
+    def is_unchanged(self, kind: str, item: str, response: requests.Response) -> bool:
+        """
+        Whether the export in response is the version last recorded for item.
+
+        Args:
+            kind (str): "problem" or "module".
+            item (str): The item's ID.
+            response (requests.Response): The response to the (possibly conditional) export request.
+
+        Returns:
+            bool: True for a 304, or for a body with the recorded updated_at and hash.
+        """
+        stored = self.get(kind, item)
+        if stored is None:
+            return False
+        if response.status_code == 304:
+            return True
+        current = version_of(response)
+        return current["sha256"] == stored["sha256"] and current["updated_at"] == stored["updated_at"]
+
+    def record(self, kind: str, item: str, response: requests.Response) -> None:
+        """Records the version in response as exported, to be called once it has been saved"""
+        version = version_of(response)
+        with self._lock:
+            self.versions.setdefault(kind, {})[str(item)] = version
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.versions, indent=4, sort_keys=True)
+        write_atomically(self.path, data.encode())
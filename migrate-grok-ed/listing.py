@@ -0,0 +1,156 @@
+"""
+Walks Grok's admin listings (author-problems, author-modules) and collects the IDs they link to.
+
+Pages are parsed with lxml, whose HTML parser is written in C, using the CSS selectors compiled once to XPath. Where
+lxml or cssselect is not installed, BeautifulSoup's html.parser is used with the same selectors instead. Rather than
+following the "next" link one page at a time, the walk reads the page numbers in the first page's pagination and
+fetches every other page concurrently. If the pagination only shows some of the pages, the walk carries on from the
+last page fetched, in further concurrent batches.
+
+Functions:
+    - parse_listing(html: str, parser: str = DEFAULT_PARSER) -> ListingPage:
+        The IDs, next link and pagination links of one listing page.
+
+    - walk_listing(fetcher: Fetcher, first_url: str, base_url: str, parser: str = DEFAULT_PARSER, **kwargs) -> List[str]:
+        The IDs linked from every page of a listing, in page order.
+"""
+import asyncio
+import logging
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+import bs4
+
+from grok_utils.fetcher import Fetcher
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # lxml and cssselect are optional, html.parser is slower but gives the same results
+    CSSSelector = None
+
+logger = logging.getLogger(__name__)
+
+# the same selectors get_problems and get_modules have always used
+LINK_SELECTOR = "tbody > tr > td > a"
+NEXT_SELECTOR = "nav > ul > li.active + li > a"
+PAGE_SELECTOR = "nav > ul > li > a"
+PAGE_PARAM = "page"
+
+PARSERS = ("lxml", "html.parser") if CSSSelector else ("html.parser",)
+DEFAULT_PARSER = PARSERS[0]
+
+if CSSSelector:
+    _compiled = {selector: CSSSelector(selector) for selector in (LINK_SELECTOR, NEXT_SELECTOR, PAGE_SELECTOR)}
+
+
+class ListingPage(NamedTuple):
+    ids: List[str]
+    # None when there is no next page
+    next_href: Optional[str]
+    page_hrefs: List[str]
+
+
+def _select_hrefs(html: str, parser: str) -> Dict[str, List[str]]:
+    if parser == "lxml":
+        root = lxml.html.fromstring(html)
+        return {selector: [a.get("href") for a in select(root)] for selector, select in _compiled.items()}
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    return {
+        selector: [a.get("href") for a in soup.select(selector)]
+        for selector in (LINK_SELECTOR, NEXT_SELECTOR, PAGE_SELECTOR)
+    }
+
+
+def parse_listing(html: str, parser: str = DEFAULT_PARSER) -> ListingPage:
+    """
+    Parses one listing page.
+
+    Args:
+        html (str): The page.
+        parser (str): One of PARSERS.
+
+    Returns:
+        ListingPage: The IDs the page links to, its next page's href, and the hrefs in its pagination.
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown parser '{parser}', expected one of {', '.join(PARSERS)}")
+    hrefs = _select_hrefs(html, parser)
+    next_hrefs = hrefs[NEXT_SELECTOR]
+    next_href = next_hrefs[0] if next_hrefs and next_hrefs[0] != "#" else None
+    return ListingPage(
+        [str(href).split("/")[-2] for href in hrefs[LINK_SELECTOR]],
+        next_href,
+        [href for href in hrefs[PAGE_SELECTOR] if href],
+    )
+
+
+def page_number(href: str) -> Optional[int]:
+    """The page a pagination href points to, or None if it does not say"""
+    values = parse_qs(urlparse(href).query).get(PAGE_PARAM)
+    try:
+        return int(values[0]) if values else None
+    except ValueError:
+        return None
+
+
+def check_logged_in(text: str) -> None:
+    if "Please log in below" in text:
+        logger.fatal("Login unsuccessful, please check your credentials")
+        raise ValueError("Unsuccessful login")
+
+
+async def walk_listing(
+    fetcher: Fetcher, first_url: str, base_url: str, parser: str = DEFAULT_PARSER, **kwargs
+) -> List[str]:
+    """
+    Collects the IDs linked from every page of a listing.
+
+    Args:
+        fetcher (Fetcher): The fetcher to send requests through.
+        first_url (str): The listing's first page.
+        base_url (str): What the listing's relative pagination hrefs (e.g. "?page=2&q=...") are relative to.
+        parser (str): One of PARSERS.
+        **kwargs: Passed on to every request, e.g. cookies and headers.
+
+    Returns:
+        list: The IDs, in page order.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def fetch_page(url: str) -> ListingPage:
+        response = await fetcher.get(url, **kwargs)
+        response.raise_for_status()
+        check_logged_in(response.text)
+        # parsing is CPU-bound, so it runs off the event loop while other pages download
+        return await loop.run_in_executor(None, parse_listing, response.text, parser)
+
+    pages = {1: await fetch_page(first_url)}
+    while True:
+        last = max(pages)
+        if pages[last].next_href is None:
+            break
+        # every page the last one fetched links to, or just its next page if its links do not give page numbers
+        batch = {
+            number: href
+            for href in pages[last].page_hrefs
+            if (number := page_number(href)) is not None and number not in pages
+        }
+        if not any(number > last for number in batch):
+            batch = {last + 1: pages[last].next_href}
+        logger.debug(f"Fetching listing pages {sorted(batch)}")
+
+        errors = []
+
+        def on_result(number, result):
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                pages[number] = result
+
+        await fetcher.for_each(batch, lambda number: fetch_page(f"{base_url}{batch[number]}"), on_result)
+        if errors:
+            # a listing with pages missing would silently skip their items
+            raise errors[0]
+
+    return [item for number in sorted(pages) for item in pages[number].ids]
@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 import re
 import markdown
 import subprocess
@@ -10,6 +11,7 @@ from itertools import chain
 from tqdm import tqdm
 from rich import print  # Use rich for all printing
 from configparser import ConfigParser
+from resources import ResourceStore
 
 config = ConfigParser()
 config.read("config/config_comp90059.ini")
@@ -37,10 +39,29 @@ def replace_inline_code(text):
     return re.sub(pattern, r"`\1`", text, flags=re.DOTALL | re.IGNORECASE)
 
 
+def get_resource_store():
+    if not get_resource_store.store:
+        get_resource_store.store = ResourceStore(Path(f"output/{grok_slug}/resources"))
+    return get_resource_store.store
+
+
+get_resource_store.store = None
+
+
+def link_resources(text: str, f: Path) -> str:
+    """
+    Points the groklearning-cdn.com links in f's text at the files scrape_grok.py downloaded for them, by a path
+    relative to f. Links to files that were not downloaded are left as they are.
+    """
+    store = get_resource_store()
+    prefix = Path(os.path.relpath(store.dir, f.parent)).as_posix() + "/"
+    return store.rewrite_links(text, prefix)
+
+
 
 def process_file(f: Path):
-    # Read the file content
-    text = f.read_text()
+    # Read the file content, linking the local copies of CDN files before "grok" is replaced below
+    text = link_resources(f.read_text(), f)
 
     # Replace code blocks with language directives
     lines = []
@@ -250,7 +271,7 @@ def process_modules():
     files = chain(origin.rglob("**/*.md"))
     for f in tqdm(files):
         # Convert the markdown to HTML
-        text = f.read_text()
+        text = link_resources(f.read_text(), f)
         text = replace_inline_code(text)
         html_content = markdown.markdown(text, extensions=["fenced_code"])
         f.with_suffix(".html").write_text(html_content)
@@ -0,0 +1,139 @@
+"""
+A content-addressed store for the groklearning-cdn.com files (images, scripts, data) that slides link to.
+
+Each file is saved once, as <sha256 of its content><suffix>, however many slides or URLs link to it. manifest.json maps
+every URL fetched to the file holding its content, so a re-run skips URLs it has already fetched, and
+preprocess_markdown.py can rewrite the CDN links in slide content to the local files (see ResourceStore.rewrite_links). URLs that could not be
+fetched are recorded with their error instead, so the next run retries them even if it does not export their slides.
+
+Classes:
+    - ResourceStore(resources_dir: Path):
+        The files and manifest in resources_dir.
+
+Functions:
+    - find_resources(content: str) -> List[str]:
+        The groklearning-cdn.com URLs in a slide's content.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+CDN_PATTERN = re.compile(r'https://groklearning-cdn\.com/[^\s")]+')
+MANIFEST_NAME = "manifest.json"
+
+
+def find_resources(content: str) -> List[str]:
+    """
+    Finds the groklearning-cdn.com URLs in a slide's content.
+
+    Args:
+        content (str): The slide's raw content.
+
+    Returns:
+        list: The URLs, in the order they appear.
+    """
+    return CDN_PATTERN.findall(content)
+
+
+def write_atomically(path: Path, data: bytes) -> None:
+    """
+    Writes data to path through a temporary file in the same directory, so that a reader (or a crash) never sees a
+    partly written file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class ResourceStore:
+    """
+    The files in resources_dir, named by the hash of their content, and the manifest of which URL holds which.
+    Safe to add to from several threads.
+    """
+
+    def __init__(self, resources_dir: Path):
+        self.dir = Path(resources_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.dir / MANIFEST_NAME
+        self.manifest: Dict[str, Dict[str, str]] = {}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+        self._lock = threading.Lock()
+
+    def __contains__(self, url: str) -> bool:
+        """Whether url has been fetched and its file is still there"""
+        entry = self.manifest.get(url)
+        return entry is not None and "file" in entry and (self.dir / entry["file"]).exists()
+
+    def failed_urls(self) -> Set[str]:
+        """The URLs whose last download failed"""
+        return {url for url, entry in self.manifest.items() if "error" in entry}
+
+    def fail(self, url: str, error: Exception) -> None:
+        """Records that url could not be downloaded, keeping any file stored for it by an earlier run"""
+        with self._lock:
+            entry = self.manifest.setdefault(url, {})
+            if "file" not in entry:
+                entry["error"] = str(error)
+
+    def add(self, url: str, content: bytes, content_type: str = "") -> str:
+        """
+        Stores the content fetched from url, unless a file with the same content is already stored.
+
+        Args:
+            url (str): The URL the content was fetched from.
+            content (bytes): The content.
+            content_type (str): The Content-Type it was served with, used for the suffix when the URL has none.
+
+        Returns:
+            str: The name of the file in the store holding the content.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        content_type = content_type.split(";")[0].strip().lower()
+        suffix = Path(urlparse(url).path).suffix.lower() or mimetypes.guess_extension(content_type) or ""
+        filename = f"{digest}{suffix}"
+        path = self.dir / filename
+        if not path.exists():
+            write_atomically(path, content)
+        with self._lock:
+            self.manifest[url] = {
+                "file": filename,
+                "sha256": digest,
+                "content_type": content_type,
+                "size": len(content),
+            }
+        return filename
+
+    def local_path(self, url: str) -> Optional[Path]:
+        """The file holding url's content, or None if it has not been fetched"""
+        entry = self.manifest.get(url, {})
+        return self.dir / entry["file"] if "file" in entry else None
+
+    def rewrite_links(self, content: str, prefix: str = "") -> str:
+        """
+        Replaces every fetched CDN URL in content with prefix followed by the name of its file, leaving URLs that
+        were not fetched as they are.
+        """
+        def replace(match: re.Match) -> str:
+            entry = self.manifest.get(match.group(0), {})
+            return f"{prefix}{entry['file']}" if "file" in entry else match.group(0)
+
+        return CDN_PATTERN.sub(replace, content)
+
+    def save(self) -> None:
+        """Writes the manifest, sorted by URL so that re-runs give small diffs"""
+        with self._lock:
+            data = json.dumps(self.manifest, indent=4, sort_keys=True)
+        write_atomically(self.manifest_path, data.encode())
@@ -1,6 +1,5 @@
 from json import JSONDecodeError
 from typing import Iterable, List, Dict, Callable, Any
-import re
 
 """
 This script scrapes problems and modules from the Grok Learning platform and exports them to a local directory.
@@ -11,10 +10,12 @@ Modules:
     - rich: For rich text and logging.
     - cachier: For caching function results.
     - tqdm: For progress bars.
-    - bs4: For parsing HTML.
+    - lxml: For parsing HTML (bs4 is used instead where it is not installed).
     - markdown: For Markdown processing.
     - convert_grok: Custom module for converting Grok problems.
     - preprocess_markdown: Custom module for preprocessing Markdown files.
+    - resources: Custom module storing the files slides link to by content hash.
+    - export_state: Custom module recording the version of each item exported, to skip unchanged ones.
 
 Functions:
     - get_truthy_config_option(option: str, section: str = CONFIG_GLOBAL_KEY) -> str:
@@ -23,8 +24,8 @@ Functions:
     - attempt_auth(f: Callable) -> Callable:
         Decorator to handle authentication and retry on HTTP 401 errors.
 
-    - get_session_token() -> str:
-        Launches a browser to log in to Grok Learning and retrieves the session token.
+    - get_session_token(force_browser: bool = False) -> str:
+        Reuses a saved Grok session if it is still valid, otherwise launches a browser to log in (see grok_utils/session.py).
 
     - get_jar() -> requests.cookies.RequestsCookieJar:
         Returns a cookie jar for storing session cookies.
@@ -35,11 +36,15 @@ Functions:
     - get_modules(session: FuturesSession) -> List[str]:
         Retrieves a list of modules from Grok Learning.
 
-    - export_problem(problem: str) -> None:
-        Exports a problem from Grok Learning to a local directory.
+    - list_ids(first_url: str, base_url: str) -> List[str]:
+        Collects the IDs linked from every page of an admin listing, fetching its pages concurrently.
 
-    - slow_tqdm(f: Callable, arg: List[Any]) -> None:
-        Wraps a function with a progress bar and adds a delay to prevent rate limiting.
+    - save_problem(problem: str, response: requests.Response) -> None:
+        Saves and converts a problem exported from Grok Learning to a local directory.
+
+    - export_concurrently(items: List[str], url_for: Callable, save: Callable, label: str, *args) -> Dict[str, Exception]:
+        Fetches items concurrently through a shared rate limiter while saving earlier ones, skipping those unchanged
+        since the last run and reporting failures rather than stopping at them.
 
     - main() -> None:
         Main function to orchestrate the scraping and exporting process.
@@ -50,36 +55,47 @@ Functions:
     - export_slide(slides: List[Dict[str, Any]], slide_dir: Path) -> None:
         Exports slides from a module to a local directory.
 
-    - export_module(module: str, modules_dir: Path) -> None:
-        Exports a module from Grok Learning to a local directory.
+    - save_module(module: str, response: requests.Response, modules_dir: Path) -> None:
+        Saves a module exported from Grok Learning to a local directory.
+
+    - download_resources(urls: Iterable[str]) -> Dict[str, Exception]:
+        Downloads the CDN files the exported slides link to, in parallel, into the resource store.
 
 Usage:
     Run the script to scrape problems and modules from Grok Learning and export them to the "output" directory.
+    Up to grok_concurrency exports are fetched at once, paced by grok_rate and grok_burst, while up to
+    grok_convert_workers threads save and convert the ones already fetched.
 """
 import requests
 from cachier import cachier
+import asyncio
 import datetime
 import logging
 import os
-import time
-import selenium.webdriver as webdriver
-import selenium.webdriver.support.ui as ui
-import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from requests_futures.sessions import FuturesSession
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 from rich.logging import RichHandler
-import bs4
 import sys
 from pathlib import Path
 import json
 import convert_grok
 import preprocess_markdown
+from resources import ResourceStore, find_resources
+from export_state import ExportState
 from cachier import cachier
 import requests.cookies
 import rich
 import configparser
 
+sys.path.insert(0, str(Path(os.path.realpath(__file__)).parent.parent))
+from grok_utils.fetcher import Fetcher, pooled_session  # pylint:disable=wrong-import-position
+from grok_utils.ratelimit import RateLimiter  # pylint:disable=wrong-import-position
+from grok_utils.session import DEFAULT_SESSION_FILE, VALIDATE_URL, login  # pylint:disable=wrong-import-position
+from listing import walk_listing  # pylint:disable=wrong-import-position
+
 ## Read config
 
 logger = logging.getLogger(__name__)
@@ -141,6 +157,14 @@ course_slug = get_truthy_config_option("grok_course_slug", MODULE_CONFIG_SECTION
 excluded_problems = config.get(MODULE_CONFIG_SECTION, option="excluded_problems", fallback="").split(",")
 excluded_modules = config.get(MODULE_CONFIG_SECTION, option="excluded_modules", fallback="").split(",")
 excluded_submodules = config.get(MODULE_CONFIG_SECTION, option="excluded_submodules", fallback="").split(",")
+rate = config.getfloat(MODULE_CONFIG_SECTION, "grok_rate", fallback=5.0)
+burst = config.getint(MODULE_CONFIG_SECTION, "grok_burst", fallback=10)
+concurrency = config.getint(MODULE_CONFIG_SECTION, "grok_concurrency", fallback=16)
+convert_workers = config.getint(MODULE_CONFIG_SECTION, "grok_convert_workers", fallback=os.cpu_count() or 1)
+# shared by every request to Grok, so problems and modules are paced as one stream
+limiter = RateLimiter(rate, burst)
+# the CDN is a separate host from Grok itself, so its files are paced separately
+cdn_rate = config.getfloat(MODULE_CONFIG_SECTION, "grok_cdn_rate", fallback=20.0)
 
 grok_url = "https://groklearning.com"
 base_search_url = (
@@ -155,6 +179,8 @@ if "log_level" in config[CONFIG_GLOBAL_KEY]:
 
 log_dir = Path("output") / course_slug / "logs"
 log_dir.mkdir(parents=True, exist_ok=True)
+# delete this file to export everything again
+export_state = ExportState(Path("output") / course_slug / "export_state.json")
 file_handler = logging.FileHandler(filename=log_dir / "scrape_grok.log")
 file_handler.formatter = logging.Formatter(
     "%(asctime)s %(name)-12s %(levelname)-8s %(message)s", datefmt="%d-%b-%y %H:%M:%S"
@@ -181,38 +207,41 @@ def attempt_auth(f: Callable) -> Callable:
         except requests.exceptions.HTTPError as err:
             if err.response.status_code == 401:
                 logger.warning("Session token was invalid, launching Grok Login")
-                session_token = get_session_token()
+                session_token = get_session_token(force_browser=True)
                 logger.debug(f"Token: {session_token}")
                 return f(*args, **kwargs)
 
     return inner
 
 
-def get_session_token() -> str:
+def get_session_token(force_browser: bool = False) -> str:
     """
-    Launches a browser to log in to Grok Learning and retrieves the session token.
+    Sets a valid Grok session in the cookie jar, reusing the token from the config file or the session saved by an
+    earlier run (of this script or get_scores_grok) when Grok still accepts it, and launching a browser to log in only
+    when it does not.
+
+    Args:
+        force_browser (bool): Log in with the browser straight away, for when Grok has just rejected the session.
 
     Returns:
-        str: The session token retrieved after logging in.
+        str: The session token in use.
     """
-    firefox_path = get_truthy_config_option("firefox_path", "GLOBAL")
+    session_token = config.get(MODULE_CONFIG_SECTION, "grok_token", fallback="")
+    # remove starting ' and ending ' from the token if it does exist
+    if session_token.startswith("'") and session_token.endswith("'"):
+        session_token = session_token[1:-1]
+
+    firefox_path = config.get(CONFIG_GLOBAL_KEY, "firefox_path", fallback=None)
     logger.debug(f"Firefox Path is {firefox_path}")
-    options = webdriver.FirefoxOptions()
-    options.binary_location = firefox_path
-
-    with contextlib.closing(webdriver.Firefox()) as driver:
-        driver.get("https://groklearning.com/login/")
-        wait = ui.WebDriverWait(driver, 180)  # timeout after 180 seconds
-        wait.until(
-            lambda driver: driver.find_elements_by_class_name("account-header-left")
-        )
-        cookie = driver.get_cookie("grok_session")
-        if not cookie:
-            raise Exception("Could not find grok_session cookie")
-        session_token = cookie.get["value"]
-        get_jar().set("grok_session", session_token, domain=".groklearning.com")
-        logger.info(f"session_token={session_token}")
-        return session_token
+    session_file = config.get(MODULE_CONFIG_SECTION, "grok_session_file", fallback=str(DEFAULT_SESSION_FILE))
+    return login(
+        get_jar(),
+        config.get(MODULE_CONFIG_SECTION, "grok_validate_url", fallback=VALIDATE_URL),
+        session_token or None,
+        session_file,
+        firefox_path,
+        force_browser,
+    )
 
 
 def get_jar() -> requests.cookies.RequestsCookieJar:
@@ -242,40 +271,7 @@ def get_problems(session: FuturesSession) -> List[str]:
     Returns:
         list: A list of problem IDs.
     """
-    search_url = base_search_url
-    hrefs = []
-    while True:
-        response: requests.Response = requests.get(
-            search_url, cookies=get_jar(), headers={"User-agent": "your bot 0.1"}
-        )
-        response.raise_for_status()
-
-        if "Please log in below" in response.text:
-            logger.fatal("Login unsuccessful, please check your credentials")
-            raise ValueError("Unsuccessful login")
-
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-        # get all hrefs inside links that follow tbody > tr > td > a
-        links = soup.select("tbody > tr > td > a")
-        hrefs += [str(link.get("href")).split("/")[-2] for link in links]
-
-        next_page_links = soup.select("nav > ul > li.active + li > a")
-
-        # deal with case where there is no next page
-        if not next_page_links:
-            logger.debug(
-                "No next page links! Are you sure you have the right course slug and token?"
-            )
-            break
-
-        next_href = next_page_links[0].get("href")
-        if next_href == "#":
-            break
-        search_url = f"https://groklearning.com/admin/author-problems/{next_href}"
-        logger.debug(search_url)
-
-    logger.debug(hrefs)
-    return hrefs
+    return list_ids(base_search_url, f"{grok_url}/admin/author-problems/")
 
 
 @attempt_auth
@@ -290,43 +286,58 @@ def get_modules(session: FuturesSession) -> List[str]:
     Returns:
         list: A list of module IDs.
     """
-    search_url = f"{grok_url}/admin/author-modules/?q_authoring_state=&q={course_slug}"
-    hrefs = []
-    while True:
-        response: requests.Response = requests.get(
-            search_url, cookies=get_jar(), headers={"User-agent": "your bot 0.1"}
+    return list_ids(
+        f"{grok_url}/admin/author-modules/?q_authoring_state=&q={course_slug}", f"{grok_url}/admin/author-modules/"
+    )
+
+
+def list_ids(first_url: str, base_url: str) -> List[str]:
+    """
+    Collects the IDs linked from every page of an admin listing, fetching its pages concurrently (see listing.py).
+
+    Args:
+        first_url (str): The listing's first page.
+        base_url (str): What the listing's pagination hrefs are relative to.
+
+    Returns:
+        list: The IDs, in page order.
+    """
+
+    async def walk(fetcher):
+        return await walk_listing(
+            fetcher, first_url, base_url, cookies=get_jar(), headers={"User-agent": "your bot 0.1"}
         )
-        response.raise_for_status()
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-        # get all hrefs inside links that follow tbody > tr > td > a
-        links = soup.select("tbody > tr > td > a")
-        hrefs += [str(link.get("href")).split("/")[-2] for link in links]
-
-        next_page_links = soup.select("nav > ul > li.active + li > a")
-        next_href = next_page_links[0].get("href")
-        if next_href == "#":
-            break
-        search_url = f"{grok_url}/admin/author-modules/{next_href}"
-        logger.debug(search_url)
 
+    with Fetcher(limiter, concurrency) as fetcher:
+        hrefs = asyncio.run(walk(fetcher))
     logger.debug(hrefs)
     return hrefs
 
 
-def export_problem(problem: str) -> None:
+def problem_export_url(problem: str) -> str:
+    return f"{grok_url}/admin/author-problems/{problem}/export/"
+
+
+def exercise_lock(exercise: str) -> threading.Lock:
+    """
+    Returns the lock held while converting into an exercise's directory, as problems sharing a title convert into the
+    same one.
     """
-    Exports a problem from Grok Learning to a local directory.
+    # setdefault is atomic, so two threads cannot end up with different locks for one exercise
+    return exercise_lock.locks.setdefault(exercise, threading.Lock())
 
-    Args:
-        problem (str): The problem ID to export.
+
+exercise_lock.locks = {}
+
+
+def save_problem(problem: str, response: requests.Response) -> None:
     """
-    response: requests.Response = requests.get(
-        f"{grok_url}/admin/author-problems/{problem}/export/",
-        cookies=get_jar(),
-        headers={"User-agent": "your bot 0.1"},
-    )
+    Saves and converts a problem exported from Grok Learning to a local directory.
 
-    response.raise_for_status()
+    Args:
+        problem (str): The problem ID exported.
+        response (requests.Response): The response to the problem's export request.
+    """
     # check if content type is json
     if response.headers["Content-Type"] == "application/json":
         try:
@@ -353,22 +364,24 @@ def export_problem(problem: str) -> None:
             title = title.split(":")[0]
         else:
             return
-        problem_obj: convert_grok.Problem = convert_grok.Problem(
-            title.replace("Exercise ", "Ex"),
-            obj,
-            course_dir / title.replace("Exercise ", "Ex"),
-        )
-        problem_obj.load()
+        exercise = title.replace("Exercise ", "Ex")
+        with exercise_lock(exercise):
+            problem_obj: convert_grok.Problem = convert_grok.Problem(
+                exercise,
+                obj,
+                course_dir / exercise,
+            )
+            problem_obj.load()
 
-        content_file = problem_obj.wd / "content.md"
-        if content_file.exists():
-            preprocess_markdown.process_file(content_file)
-            preprocess_markdown.unescape_file(content_file.with_suffix(".xml"))
+            content_file = problem_obj.wd / "content.md"
+            if content_file.exists():
+                preprocess_markdown.process_file(content_file)
+                preprocess_markdown.unescape_file(content_file.with_suffix(".xml"))
 
-        content_file = problem_obj.wd / "solution_notes.md"
-        if content_file.exists():
-            preprocess_markdown.process_file(content_file)
-            preprocess_markdown.unescape_file(content_file.with_suffix(".xml"))
+            content_file = problem_obj.wd / "solution_notes.md"
+            if content_file.exists():
+                preprocess_markdown.process_file(content_file)
+                preprocess_markdown.unescape_file(content_file.with_suffix(".xml"))
 
     else:
         logger.error(
@@ -376,20 +389,93 @@ def export_problem(problem: str) -> None:
         )
 
 
-def slow_tqdm(f: Callable, iter: Iterable, args=None) -> None:
+async def fetch_export(
+    fetcher: Fetcher, url: str, reauth: asyncio.Lock, headers: Dict[str, str] = None
+) -> requests.Response:
     """
-    Wraps a function with a progress bar and adds a delay to prevent rate limiting.
+    Fetches an export, logging in again once if Grok rejects the session.
 
     Args:
-        f (function): The function to wrap.
-        arg (iterable): The iterable to process with the function.
+        fetcher (Fetcher): The fetcher to send the request through.
+        url (str): The export URL.
+        reauth (asyncio.Lock): Held while logging in again, so that concurrent rejections only log in once.
+        headers (dict, optional): Extra request headers, e.g. to make the request conditional.
+
+    Returns:
+        requests.Response: The successful (or 304 Not Modified) response.
     """
-    with logging_redirect_tqdm():
-        for i, elem in tqdm(enumerate(iter)):
-            args = args or ()
-            f(elem, *args)
-            if i % 10 == 0:
-                time.sleep(0.3)  # add delay to prevent rate limiting by Grok servers
+    headers = {"User-agent": "your bot 0.1", **(headers or {})}
+    sent_token = get_jar().get("grok_session")
+    response = await fetcher.get(url, cookies=get_jar(), headers=headers)
+    if response.status_code == 401:
+        async with reauth:
+            # another export may have logged in again while this one waited
+            if get_jar().get("grok_session") == sent_token:
+                logger.warning("Session token was invalid, launching Grok Login")
+                await asyncio.get_running_loop().run_in_executor(None, get_session_token, True)
+        response = await fetcher.get(url, cookies=get_jar(), headers=headers)
+    response.raise_for_status()
+    return response
+
+
+def export_concurrently(items: List[str], url_for: Callable, save: Callable, label: str, *args) -> Dict[str, Exception]:
+    """
+    Fetches every item's export and saves it, with up to grok_concurrency fetches in flight (paced by the shared rate
+    limiter) while up to grok_convert_workers threads save the ones already fetched. Items that have not changed since
+    they were last saved (see export_state.py) are not saved again. An item that fails is logged and the rest carry on.
+
+    Args:
+        items (list): The IDs to export.
+        url_for (function): Gives the export URL of an ID.
+        save (function): Called as save(item, response, *args) to save a fetched export.
+        label (str): What the items are, for progress and log messages.
+
+    Returns:
+        dict: The exception each failed item raised, by ID.
+    """
+    failures = {}
+    unchanged = []
+    progress = tqdm(total=len(items), desc=f"Exporting {label}s")
+
+    async def export_one(fetcher, converter, reauth, item):
+        response = await fetch_export(fetcher, url_for(item), reauth, export_state.request_headers(label, item))
+        if export_state.is_unchanged(label, item, response):
+            unchanged.append(item)
+            return
+        await asyncio.get_running_loop().run_in_executor(converter, save, item, response, *args)
+        export_state.record(label, item, response)
+
+    def on_result(item, result):
+        if isinstance(result, Exception):
+            failures[item] = result
+            logger.error(f"Failed to export {label} {item}: {result}")
+        progress.update()
+        progress.set_postfix_str(
+            f"{len(unchanged)} unchanged, {len(failures)} failed, {limiter.status()}", refresh=False
+        )
+
+    async def export_all(fetcher, converter):
+        reauth = asyncio.Lock()
+        await fetcher.for_each(items, lambda item: export_one(fetcher, converter, reauth, item), on_result)
+
+    try:
+        with Fetcher(limiter, concurrency) as fetcher, ThreadPoolExecutor(convert_workers) as converter, logging_redirect_tqdm():
+            asyncio.run(export_all(fetcher, converter))
+    finally:
+        # keep what was saved even if the run is interrupted
+        export_state.save()
+        progress.close()
+    logger.info(f"{len(unchanged)} of {len(items)} {label}s unchanged since the last run")
+    return failures
+
+
+def report_failures(label: str, total: int, failures: Dict[str, Exception]) -> None:
+    if not failures:
+        logger.info(f"Exported all {total} {label}s")
+        return
+    logger.warning(f"Exported {total - len(failures)} of {total} {label}s, {len(failures)} failed:")
+    for item, err in failures.items():
+        logger.warning(f"  {label} {item}: {err!r}")
 
 
 def main() -> None:
@@ -399,29 +485,13 @@ def main() -> None:
     session: FuturesSession = FuturesSession()
 
     # Get the session token and validate
-    try:
-        session_token: str = get_truthy_config_option(
-            "grok_token", MODULE_CONFIG_SECTION
-        )
-
-        # remove starting ' and ending ' from the token if it does exist
-        if session_token.startswith("'") and session_token.endswith("'"):
-            session_token = session_token[1:-1]
-
-        if not session_token:
-            raise ValueError("Session token not found")
-    except ValueError:
-        logger.warning("Session token not found, launching Grok Login")
-        session_token = get_session_token()
-        logger.debug(session_token)
-    else:
-        get_jar().set("grok_session", session_token, domain=".groklearning.com")
+    get_session_token()
 
     # get list of problems and export
     logger.info("Getting List of Problems...")
     problems = get_problems(session)
     logger.debug(problems)
-    slow_tqdm(export_problem, problems)
+    problem_failures = export_concurrently(problems, problem_export_url, save_problem, "problem")
     logger.debug(generate_problem_id_map())
 
     # sys.exit(0)
@@ -432,7 +502,15 @@ def main() -> None:
     logger.debug(modules)
     modules_dir = Path("output") / course_slug / "modules"
     os.makedirs(modules_dir, exist_ok=True)
-    slow_tqdm(export_module, modules, [modules_dir])
+    module_failures = export_concurrently(modules, module_export_url, save_module, "module", modules_dir)
+
+    # every slide has been exported, so each file linked from any of them is downloaded once
+    logger.info(f"Downloading {len(resource_urls)} linked resources...")
+    resource_failures = download_resources(resource_urls)
+
+    report_failures("problem", len(problems), problem_failures)
+    report_failures("module", len(modules), module_failures)
+    report_failures("resource", len(resource_urls), resource_failures)
 
     # TODO: what about getting slides outside module and exporting
 
@@ -502,75 +580,79 @@ def export_slide(slides: List[Dict[str, Any]], slide_dir: Path) -> None:
             logger.info(f"Exported {slide_title} to {dest}")
             if not DRY_RUN:
                 dest.write_text(slide_content)
-            download_resources(slide_content)
+            # downloaded once every module is exported, by download_resources
+            resource_urls.update(find_resources(slide_content))
 
         else:
             raise ValueError(f"Unknown slide type {slide['type']}")
 
 
-@attempt_auth
-def download_resources(slide_content: str):
+resource_urls = set()
+
+
+def download_resources(urls: Iterable[str]) -> Dict[str, Exception]:
     """
-    Downloads resources - images and additional scripts from a slide's content and saves in resources folder
+    Downloads the groklearning-cdn.com files linked from slides into the resource store in output/<course>/resources,
+    with up to grok_concurrency downloads in flight over one pooled session. URLs already in the store's manifest are
+    skipped, URLs that failed on an earlier run are retried, and a file is only written if no stored file has the same
+    content.
 
     Args:
-        slide_content: content to be parsed for grok learning cdn hyperlinks for resources
+        urls (iterable): The CDN URLs to download.
+
+    Returns:
+        dict: The exception each failed download raised, by URL.
     """
-    pattern = r'https://groklearning-cdn\.com/[^\s")]+'
-    matches = re.findall(pattern, slide_content)
-    session = requests.Session()
+    store = ResourceStore(Path("output") / course_slug / "resources")
+    # slides of modules unchanged since the last run are not exported again, so their failed URLs come from the store
+    pending = sorted(url for url in set(urls) | store.failed_urls() if url not in store)
+    logger.info(f"{len(pending)} resources to download, the rest are already stored")
+    failures = {}
+    progress = tqdm(total=len(pending), desc="Downloading resources")
+
+    session = pooled_session(concurrency)
     session.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
     })
-    for match in matches:
-        logger.info(f"Downloading resources : {match}")
-        response: requests.Response = session.get(match)
 
+    async def download(fetcher, url):
+        response = await fetcher.get(url, timeout=60)
         response.raise_for_status()
-        resources_dir = Path("output") / course_slug / "resources"
-        resources_dir.mkdir(parents=True, exist_ok=True)
-
-        content_type = response.headers.get('Content-Type', '').lower()
-        filename = "_".join(match.split("/")[-2:])
-
-        if "image" in content_type:
-            # Handle image files
-            file_path = os.path.join(resources_dir, filename)
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Image saved to {file_path}")
-        elif "text" in content_type or "json" in content_type:
-            # Handle text-based files
-            file_path = os.path.join(resources_dir, filename)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print(f"Text saved to {file_path}")
+        return response
+
+    def on_result(url, result):
+        if isinstance(result, Exception):
+            failures[url] = result
+            store.fail(url, result)
+            logger.error(f"Failed to download {url}: {result}")
         else:
-            # Handle other binary files
-            file_path = os.path.join(resources_dir, filename)
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Binary file saved to {file_path}")
+            filename = store.add(url, result.content, result.headers.get("Content-Type", ""))
+            logger.debug(f"Stored {url} as {filename}")
+        progress.update()
+
+    try:
+        with Fetcher(RateLimiter(cdn_rate, burst), concurrency, session) as fetcher, logging_redirect_tqdm():
+            asyncio.run(fetcher.for_each(pending, lambda url: download(fetcher, url), on_result))
+    finally:
+        # keep what was downloaded even if the run is interrupted
+        store.save()
+        progress.close()
+    return failures
+
 
+def module_export_url(module: str) -> str:
+    return f"{grok_url}/admin/api/module/{module}"
 
-def export_module(module: str, modules_dir: Path) -> None:
+
+def save_module(module: str, response: requests.Response, modules_dir: Path) -> None:
     """
-    Exports a module from Grok Learning to a local directory.
+    Saves a module exported from Grok Learning to a local directory.
 
     Args:
-        module (str): The module ID to export.
+        module (str): The module ID exported.
+        response (requests.Response): The response to the module's export request.
         modules_dir (Path): The directory to export the module to.
     """
-    response: requests.Response = requests.get(
-        f"{grok_url}/admin/api/module/{module}",
-        cookies=get_jar(),
-        headers={"User-agent": "your bot 0.1"},
-    )
-
-    response.raise_for_status()
-
     # check if content type is json
 
     module_dir = modules_dir / str(module)
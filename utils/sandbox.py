@@ -0,0 +1,262 @@
+"""Sandboxes for running check50 (or style50) over a student's submission.
+
+Every backend presents the same layout to the command it runs: the student's code plus the instructor's dist files in
+/src (which is also the working directory), and the check50 checks in /opt/check_files.
+
+- docker: runs the shaananc/check50 image, limited with --cpus, --memory and --pids-limit. A named volume is mounted at
+  /cache so the image's compiler cache is shared by every container. Only the image's compile pass writes to it, before
+  any student code runs; the checks themselves see it read-only (see autograding-docker-image/docker-entrypoint).
+- bwrap: runs the check50 installed on the host inside a bubblewrap jail (fresh user, pid, ipc, net and mount namespaces)
+  with rlimits on data size, CPU time and file size. Linux only, but avoids the cost of starting a container, which
+  dominates the running time of small C questions.
+
+The backend is chosen with the 'sandbox' option in config.ini.
+
+Commands can stream their output: given on_line, run() hands over each line of stdout as soon as it is written, which
+is how check50-stream (CHECK50_STREAM_COMMAND) reports every check's result the moment it finishes.
+"""
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from utils import config, get_truthy_config_option, logger
+from utils.scheduler import parse_memory
+
+CHECK50_COMMAND = ["check50", "-o", "json", "--dev", "/opt/check_files"]
+
+# one line of JSON per check, written as each check finishes (see autograding-docker-image/check50-stream)
+CHECK50_STREAM_COMMAND = ["check50-stream", "--dev", "/opt/check_files"]
+CHECK50_STREAM_SCRIPT = Path(__file__).absolute().parent.parent / "autograding/autograding-docker-image/check50-stream"
+
+
+@dataclass
+class Limits:
+    cpus: float = 1.0
+    memory: str = "512m"
+    pids: int = 128
+    timeout: float = 120
+    # largest file a bwrap sandboxed process may write, bounds runaway output
+    file_size: str = "64m"
+
+
+class Sandbox:
+    """Runs a command against a submission, returning its stdout or None if it was killed for running too long"""
+
+    name = ""
+
+    def __init__(self, checks_dir, dist_dir, limits: Limits):
+        self.checks_dir = Path(checks_dir).expanduser().absolute()
+        self.dist_dir = Path(dist_dir).expanduser().absolute()
+        self.limits = limits
+
+    def run(
+        self, command: List[str], student_dir: Path, on_line: Optional[Callable[[bytes], None]] = None
+    ) -> Optional[bytes]:
+        """on_line, if given, is called with each line of stdout as it is written"""
+        raise NotImplementedError
+
+    def _communicate(self, p: subprocess.Popen, kill: Callable, on_line=None) -> Optional[bytes]:
+        """Collects the stdout of p, calling kill if it is still running after the time limit"""
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            kill()
+
+        timer = threading.Timer(self.limits.timeout, expire)
+        timer.start()
+        try:
+            if on_line is None:
+                stdout, _ = p.communicate()
+            else:
+                lines = []
+                for line in p.stdout:
+                    lines.append(line)
+                    on_line(line)
+                p.wait()
+                stdout = b"".join(lines)
+        finally:
+            timer.cancel()
+
+        return None if timed_out.is_set() else stdout
+
+
+class DockerSandbox(Sandbox):
+    name = "docker"
+    image = "shaananc/check50"
+
+    def __init__(self, checks_dir, dist_dir, limits: Limits, cache_volume: Optional[str] = "check50-cache"):
+        super().__init__(checks_dir, dist_dir, limits)
+        self.cache_volume = cache_volume
+
+    def run(self, command: List[str], student_dir: Path, on_line=None) -> Optional[bytes]:
+        container_name = f"grader-{uuid.uuid4().hex[:12]}"
+
+        # the container copies the dist files into /src, so it gets a copy of the student's code rather than the
+        # original. Those files belong to the container's cs50 user, hence ignoring what cannot be cleaned up
+        with tempfile.TemporaryDirectory(prefix="grader-", ignore_cleanup_errors=True) as work_dir:
+            src = Path(work_dir) / "src"
+            shutil.copytree(student_dir, src)
+
+            # no -ti here, a pseudo-TTY would interleave stderr with the output and tie every parallel run to the
+            # terminal
+            docker_command = [
+                "docker",
+                "run",
+                f"--volume={self.checks_dir}:/opt/check_files",
+                f"--volume={src}:/src",
+                f"--volume={self.dist_dir}:/dist",
+                *([f"--volume={self.cache_volume}:/cache"] if self.cache_volume else []),
+                f"--name={container_name}",
+                f"--cpus={self.limits.cpus}",
+                f"--memory={self.limits.memory}",
+                f"--memory-swap={self.limits.memory}",
+                f"--pids-limit={self.limits.pids}",
+                "--rm",
+                self.image,
+                *command,
+            ]
+
+            def kill():
+                # killing the docker client does not stop the container, so remove it by name
+                logger.error(
+                    f"{command[0]} in {student_dir} exceeded {self.limits.timeout}s, killing {container_name}"
+                )
+                subprocess.run(["docker", "kill", container_name], capture_output=True, check=False)
+
+            p = subprocess.Popen(docker_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            return self._communicate(p, kill, on_line)
+
+
+class BubblewrapSandbox(Sandbox):
+    name = "bwrap"
+
+    # host directories the jail needs read-only to find python, check50 and clang
+    system_dirs = ["/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/etc"]
+
+    def __init__(
+        self, checks_dir, dist_dir, limits: Limits, bwrap_path: str = "bwrap", prlimit_path: str = "prlimit"
+    ):
+        super().__init__(checks_dir, dist_dir, limits)
+        self.bwrap_path = bwrap_path
+        self.prlimit_path = prlimit_path
+
+    def _rlimit_args(self) -> List[str]:
+        """bwrap has no cgroup support, so limits are rlimits instead, set by prlimit before it execs bwrap.
+
+        They used to be set in a preexec_fn, but jobs run on the scheduler's threads, and forking a threaded process to
+        run Python before exec can deadlock the child.
+        """
+        memory = parse_memory(self.limits.memory)
+        cpu_seconds = math.ceil(self.limits.timeout * self.limits.cpus)
+        file_size = parse_memory(self.limits.file_size)
+        # RLIMIT_DATA rather than RLIMIT_AS, clang and python reserve far more address space than they ever touch
+        return [
+            self.prlimit_path,
+            f"--data={memory}",
+            f"--cpu={cpu_seconds}",
+            f"--fsize={file_size}",
+            "--core=0",
+            "--",
+        ]
+
+    def _bind_args(self, src: Path) -> List[str]:
+        args = []
+        for d in self.system_dirs:
+            if Path(d).exists():
+                args += ["--ro-bind", d, d]
+
+        # a virtualenv outside /usr also needs to be visible for the host's check50 to run
+        prefix = Path(sys.prefix).resolve()
+        if not any(prefix.is_relative_to(d) for d in self.system_dirs):
+            args += ["--ro-bind", str(prefix), str(prefix)]
+
+        return args + [
+            "--proc", "/proc",
+            "--dev", "/dev",
+            "--tmpfs", "/tmp",
+            "--ro-bind", str(self.checks_dir), "/opt/check_files",
+            "--bind", str(src), "/src",
+            "--chdir", "/src",
+            "--setenv", "HOME", "/tmp",
+            # check50-stream is not installed on the host, so it is put on the jail's PATH from this repository
+            "--ro-bind", str(CHECK50_STREAM_SCRIPT), "/opt/bin/check50-stream",
+            "--setenv", "PATH", f"/opt/bin:{os.environ.get('PATH', os.defpath)}",
+        ]
+
+    def run(self, command: List[str], student_dir: Path, on_line=None) -> Optional[bytes]:
+        with tempfile.TemporaryDirectory(prefix="grader-") as work_dir:
+            # mirror docker-entrypoint: the student's code with the dist files copied over the top
+            src = Path(work_dir) / "src"
+            shutil.copytree(student_dir, src)
+            shutil.copytree(self.dist_dir, src, dirs_exist_ok=True)
+
+            bwrap_command = [
+                *self._rlimit_args(),
+                self.bwrap_path,
+                "--unshare-all",
+                "--die-with-parent",
+                "--new-session",
+                *self._bind_args(src),
+                *command,
+            ]
+            p = subprocess.Popen(
+                bwrap_command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+
+            def kill():
+                logger.error(f"{command[0]} in {student_dir} exceeded {self.limits.timeout}s, killing it")
+                try:
+                    os.killpg(p.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            return self._communicate(p, kill, on_line)
+
+
+SANDBOXES = {sandbox.name: sandbox for sandbox in (DockerSandbox, BubblewrapSandbox)}
+
+
+def get_limits(section: str) -> Limits:
+    """Reads per-job resource limits from a config section, defaulting any that are unset"""
+    defaults = Limits()
+    return Limits(
+        cpus=config.getfloat(section, "check_cpus", fallback=defaults.cpus),
+        memory=config.get(section, "check_memory", fallback=defaults.memory),
+        pids=config.getint(section, "check_pids", fallback=defaults.pids),
+        timeout=config.getfloat(section, "check_timeout", fallback=defaults.timeout),
+        file_size=config.get(section, "check_file_size", fallback=defaults.file_size),
+    )
+
+
+def get_sandbox(
+    section: str, name: Optional[str] = None, checks_dir=None, dist_dir=None
+) -> Sandbox:
+    """Builds the sandbox configured in a config section. Any arguments given override the configured values"""
+    name = name or config.get(section, "sandbox", fallback=DockerSandbox.name)
+    if name not in SANDBOXES:
+        raise ValueError(f"Unknown sandbox '{name}', expected one of {', '.join(SANDBOXES)}")
+
+    checks_dir = checks_dir or get_truthy_config_option("path_to_checks", section)
+    dist_dir = dist_dir or get_truthy_config_option("path_to_dist", section)
+    limits = get_limits(section)
+    if name == BubblewrapSandbox.name:
+        bwrap_path = config.get(section, "bwrap_path", fallback="bwrap")
+        prlimit_path = config.get(section, "prlimit_path", fallback="prlimit")
+        return BubblewrapSandbox(checks_dir, dist_dir, limits, bwrap_path, prlimit_path)
+
+    # an empty cache_volume turns the shared compiler cache off
+    cache_volume = config.get(section, "cache_volume", fallback="check50-cache")
+    return DockerSandbox(checks_dir, dist_dir, limits, cache_volume or None)
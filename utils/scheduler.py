@@ -0,0 +1,140 @@
+"""Runs autograding jobs on a bounded worker pool sized to the resources of the machine.
+
+Each job is expected to enforce its own per-job limits (e.g. `docker run --cpus`), the scheduler only decides how many
+jobs may run at once and reports queue depth and throughput while they do.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from rich.progress import BarColumn, Progress, TextColumn, TimeElapsedColumn
+
+from utils import logger
+
+MEMORY_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_memory(memory: str) -> int:
+    """Converts a docker style memory string (e.g. 512m, 2g) into a number of bytes"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([bkmg]?)b?\s*", memory.lower())
+    if not match:
+        raise ValueError(f"Could not parse memory limit '{memory}'")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+def available_cores() -> int:
+    """The number of cores this process may run on, respecting affinity masks where the platform supports them"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory() -> Optional[int]:
+    """Bytes of physical memory currently available, or None if the platform does not report it"""
+    # MemAvailable counts the page cache the kernel would give back, which is most of the memory on a machine that has
+    # been running for a while. SC_AVPHYS_PAGES is only MemFree, so it is just the fallback where /proc is missing
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_worker_count(cpus_per_job: float = 1.0, memory_per_job: Optional[str] = None) -> int:
+    """Picks as many workers as fit in both the available cores and the available memory"""
+    workers = int(available_cores() / max(cpus_per_job, 0.1))
+    free_memory = available_memory()
+    if memory_per_job and free_memory:
+        workers = min(workers, free_memory // parse_memory(memory_per_job))
+    return max(1, workers)
+
+
+class JobScheduler:
+    """Runs `job` over a set of keyed arguments, at most `max_workers` at a time, showing progress as it goes"""
+
+    def __init__(
+        self,
+        job: Callable[[Any], Any],
+        max_workers: Optional[int] = None,
+        description: str = "[red]Running automated tests...",
+    ):
+        self.job = job
+        self.max_workers = max_workers or default_worker_count()
+        self.description = description
+        self._lock = threading.Lock()
+        self._progress = None
+        self._task = None
+        self._total = self._completed = self._running = 0
+        self._start = 0.0
+
+    def _run_one(self, arg):
+        with self._lock:
+            self._running += 1
+        self._refresh()
+        try:
+            return self.job(arg)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+            self._refresh()
+
+    def _refresh(self):
+        """Updates the queue depth and throughput shown on the progress bar"""
+        with self._lock:
+            running, completed = self._running, self._completed
+        elapsed_minutes = (time.monotonic() - self._start) / 60
+        self._progress.update(
+            self._task,
+            completed=completed,
+            queued=self._total - completed - running,
+            running=running,
+            throughput=completed / elapsed_minutes if elapsed_minutes else 0.0,
+        )
+
+    def run_all(self, jobs: Dict[Hashable, Any]) -> Dict[Hashable, Any]:
+        """Runs every job, returning a dictionary of results with the same keys.
+
+        A job that raises is logged and given a result of None, so that one bad submission does not stop the batch.
+        """
+        results = {}
+        if not jobs:
+            return results
+
+        logger.info(f"Running {len(jobs)} jobs on {self.max_workers} workers")
+        self._progress = Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            TextColumn("[cyan]{task.fields[queued]} queued"),
+            TextColumn("[yellow]{task.fields[running]} running"),
+            TextColumn("[green]{task.fields[throughput]:.1f}/min"),
+            TimeElapsedColumn(),
+            expand=True,
+        )
+        self._total, self._completed, self._running = len(jobs), 0, 0
+        self._start = time.monotonic()
+        with self._progress, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._task = self._progress.add_task(
+                self.description, total=self._total, queued=self._total, running=0, throughput=0.0
+            )
+            futures = {executor.submit(self._run_one, arg): key for key, arg in jobs.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:  # pylint:disable=broad-except
+                    logger.error(f"Job {key} failed: {e}")
+                    results[key] = None
+
+        return results